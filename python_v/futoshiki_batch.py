@@ -0,0 +1,405 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque, defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from futoshiki_cache import ResultStore, SolutionCache, from_canonical, puzzle_fingerprint, to_canonical
+from futoshiki_solver import BackTracker, SolverStats, parse_puzzle_lines
+
+def encode_constraints(const):
+    """{(r, c): rel} -> [[r, c, rel], ...] (JSON não aceita tuplas como chave)"""
+    return [[r, c, rel] for (r, c), rel in sorted(const.items())]
+
+def decode_constraints(items):
+    """[[r, c, rel], ...] -> {(r, c): rel}"""
+    return {(r, c): rel for r, c, rel in items}
+
+def decode_record(record):
+    """
+    Converte um registro JSON em (puzzle, h_const, v_const). Formatos aceitos:
+        {"id": ..., "puzzle": [[...]], "h_const": [[r, c, rel], ...], "v_const": [[r, c, rel], ...]}
+        {"id": ..., "text": "<grade no formato de puzzle.txt>"}
+    Levanta ValueError se o registro for inválido.
+    """
+    if 'text' in record:
+        return parse_puzzle_lines(record['text'].splitlines())
+    puzzle = record['puzzle']
+    size = len(puzzle)
+    if size == 0 or any(len(row) != size for row in puzzle):
+        raise ValueError("O puzzle deve ser uma matriz quadrada.")
+    if any(not isinstance(v, int) or v < 0 or v > size for row in puzzle for v in row):
+        raise ValueError(f"Valores devem estar entre 0 (vazia) e {size}.")
+    return ([list(row) for row in puzzle],
+            decode_constraints(record.get('h_const', [])),
+            decode_constraints(record.get('v_const', [])))
+
+def iter_jsonl(f, source_name):
+    """Lê registros JSONL um a um: gera (id, (puzzle, h_const, v_const) ou None, erro ou None)"""
+    for line_no, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        puzzle_id = f"{source_name}:{line_no}"
+        try:
+            record = json.loads(line)
+            puzzle_id = record.get('id', puzzle_id)
+            yield puzzle_id, decode_record(record), None
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            yield puzzle_id, None, f"Registro inválido: {e}"
+
+def iter_directory(path):
+    """Lê cada arquivo do diretório (em ordem de nome) como um puzzle no formato de grade"""
+    for name in sorted(os.listdir(path)):
+        full_path = os.path.join(path, name)
+        if not os.path.isfile(full_path):
+            continue
+        try:
+            with open(full_path, 'r') as f:
+                yield name, parse_puzzle_lines(f), None
+        except (OSError, ValueError) as e:
+            yield name, None, f"Arquivo inválido: {e}"
+
+def iter_puzzles(source):
+    """Fonte de puzzles: '-' (JSONL na entrada padrão), diretório ou arquivo JSONL"""
+    if source == '-':
+        yield from iter_jsonl(sys.stdin, 'stdin')
+    elif os.path.isdir(source):
+        yield from iter_directory(source)
+    else:
+        with open(source, 'r') as f:
+            yield from iter_jsonl(f, os.path.basename(source))
+
+def solve_puzzle(puzzle_id, parsed, error, solver_options, cache=None, with_stats=False):
+    """
+    Resolve um puzzle e retorna o resultado (um dicionário por linha de saída).
+    Com um SolutionCache, puzzles repetidos ou simétricos a um já resolvido saem do cache.
+    with_stats: inclui as estatísticas da busca (SolverStats.to_dict) em 'stats'; respostas
+    do cache não têm busca e saem sem elas.
+    """
+    if error is not None:
+        return {'id': puzzle_id, 'status': 'error', 'error': error}
+    puzzle, h_const, v_const = parsed
+    start_time = time.perf_counter()
+    try:
+        if cache is not None:
+            solution, status, nodes = cache.solve(puzzle, h_const, v_const, **solver_options)
+            stats = cache.last_stats
+        else:
+            solver = BackTracker(puzzle, h_const, v_const, verbose=False, **solver_options)
+            solution = solver.solve()
+            status, nodes, stats = solver.status, solver.node_visits, solver.stats
+    except ValueError as e:
+        return {'id': puzzle_id, 'status': 'error', 'error': str(e)}
+    result = {'id': puzzle_id,
+              'status': status,
+              'solution': solution,
+              'nodes': nodes,
+              'time': round(time.perf_counter() - start_time, 6)}
+    if with_stats and stats is not None:
+        result['stats'] = stats.to_dict()
+    return result
+
+def encode_task(puzzle_id, parsed, error):
+    """
+    Codificação compacta de um puzzle para envio a um processo do pool:
+    (id, tamanho, valores em bytes, h_const e v_const como bytes r,c,rel,...).
+    """
+    if error is not None:
+        return (puzzle_id, 0, b'', b'', error)
+    puzzle, h_const, v_const = parsed
+    return (puzzle_id, len(puzzle),
+            bytes(v for row in puzzle for v in row),
+            bytes(x for (r, c), rel in h_const.items() for x in (r, c, rel)),
+            bytes(x for (r, c), rel in v_const.items() for x in (r, c, rel)))
+
+def decode_task(task):
+    """Inverso de encode_task: retorna (id, (puzzle, h_const, v_const) ou None, erro ou None)"""
+    puzzle_id, size, values, h_bytes, v_bytes = task[:5]
+    if not size:
+        return puzzle_id, None, v_bytes
+    puzzle = [list(values[r * size:(r + 1) * size]) for r in range(size)]
+    h_const = {(h_bytes[i], h_bytes[i + 1]): h_bytes[i + 2] for i in range(0, len(h_bytes), 3)}
+    v_const = {(v_bytes[i], v_bytes[i + 1]): v_bytes[i + 2] for i in range(0, len(v_bytes), 3)}
+    return puzzle_id, (puzzle, h_const, v_const), None
+
+_worker_options = None  # Opções do solver no processo do pool (definidas por _init_worker)
+_worker_cache = None  # SolutionCache do processo do pool (None: sem cache)
+_worker_with_stats = False  # Inclui as estatísticas da busca nos resultados
+
+def _init_worker(solver_options, lru_size=0, with_stats=False):
+    """
+    Inicialização de cada processo do pool. As opções chegam uma única vez; as topologias
+    (get_topology) e as soluções (SolutionCache) ficam em cache no processo e são
+    reaproveitadas por todos os seus puzzles.
+    """
+    global _worker_options, _worker_cache, _worker_with_stats
+    _worker_options = solver_options
+    _worker_cache = SolutionCache(lru_size) if lru_size > 0 else None
+    _worker_with_stats = with_stats
+
+def _solve_task(task):
+    """Executado no pool: decodifica, resolve e identifica o processo que resolveu"""
+    try:
+        result = solve_puzzle(*decode_task(task), _worker_options, _worker_cache, _worker_with_stats)
+    except Exception as e:  # Um puzzle problemático não derruba o lote
+        result = {'id': task[0], 'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+    result['worker'] = os.getpid()
+    return result
+
+def iter_results_parallel(puzzles, solver_options, workers, ordered=True, window=None, lru_size=0,
+                          with_stats=False, lookup=None):
+    """
+    Resolve os puzzles em um pool de processos, gerando os resultados na ordem de entrada
+    (ordered=True) ou à medida que terminam. No máximo 'window' puzzles ficam em trânsito,
+    o que mantém a memória limitada mesmo para entradas enormes.
+    lookup(id, parsed, erro): resultado já conhecido do puzzle ou None (ver iter_results_stored);
+    os conhecidos não vão ao pool, mas ocupam a janela como os demais.
+    """
+    window = window or workers * 4
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(solver_options, lru_size, with_stats)) as pool:
+        pending = deque() if ordered else set()
+
+        def submit(puzzle_id, parsed, error):
+            known = lookup(puzzle_id, parsed, error) if lookup is not None else None
+            if known is not None:  # Resultado já conhecido: não precisa ir ao pool
+                future = Future()
+                future.set_result(known)
+            elif error is not None:  # Erro de leitura: não precisa ir ao pool
+                future = Future()
+                future.set_result({'id': puzzle_id, 'status': 'error', 'error': error})
+            else:
+                future = pool.submit(_solve_task, encode_task(puzzle_id, parsed, error))
+            if ordered:
+                pending.append(future)
+            else:
+                pending.add(future)
+
+        def drain(limit):
+            # Libera resultados até restarem no máximo 'limit' puzzles em trânsito
+            while len(pending) > limit:
+                if ordered:
+                    yield pending.popleft().result()
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.discard(future)
+                        yield future.result()
+
+        for item in puzzles:
+            submit(*item)
+            yield from drain(window - 1)
+        yield from drain(0)
+
+def iter_results_numpy(puzzles, solver_options, chunk_size=1024, with_stats=False, lookup=None):
+    """
+    Resolve os puzzles em blocos de 'chunk_size' com a propagação vetorizada de
+    futoshiki_numpy (um tensor de domínios por tamanho de tabuleiro); só os puzzles que ainda
+    precisam de busca vão ao BackTracker. Os resultados saem na ordem de entrada; o tempo de
+    cada puzzle é a sua fração do tempo do bloco. Com with_stats, os puzzles que foram à busca
+    levam as estatísticas do BackTracker (só da busca, depois da propagação vetorizada).
+    lookup: como em iter_results_parallel; os puzzles conhecidos não entram no tensor.
+    """
+    from futoshiki_numpy import solve_batch  # numpy só é exigido com --numpy
+
+    options = dict(solver_options)
+    quad_size = options.pop('quad_size', None)
+
+    def solve_chunk(chunk):
+        results = [None] * len(chunk)
+        groups = defaultdict(list)  # Tamanho do tabuleiro -> posições no bloco
+        for i, (puzzle_id, parsed, error) in enumerate(chunk):
+            known = lookup(puzzle_id, parsed, error) if lookup is not None else None
+            if known is not None:
+                results[i] = known
+            elif error is not None:
+                results[i] = {'id': puzzle_id, 'status': 'error', 'error': error}
+            else:
+                groups[len(parsed[0])].append(i)
+        for positions in groups.values():
+            parsed = [chunk[i][1] for i in positions]
+            start_time = time.perf_counter()
+            try:
+                solved = solve_batch([p for p, _, _ in parsed], [h for _, h, _ in parsed],
+                                     [v for _, _, v in parsed], quad_size=quad_size, **options)
+            except ValueError:  # Algum puzzle inválido no grupo: resolve um a um
+                for i in positions:
+                    results[i] = solve_puzzle(*chunk[i], solver_options, with_stats=with_stats)
+                continue
+            share = round((time.perf_counter() - start_time) / len(positions), 6)
+            for i, (solution, status, nodes, stats) in zip(positions, solved):
+                results[i] = {'id': chunk[i][0], 'status': status, 'solution': solution,
+                              'nodes': nodes, 'time': share}
+                if with_stats and stats is not None:
+                    results[i]['stats'] = stats.to_dict()
+        return results
+
+    chunk = []
+    for item in puzzles:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield from solve_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield from solve_chunk(chunk)
+
+def iter_results_stored(puzzles, store, solve_items, quad_size=None, chunk_size=1024):
+    """
+    Resultados com o ResultStore na frente: solve_items(itens, lookup) consulta lookup para
+    cada puzzle ao recebê-lo, e os já conhecidos saem direto do armazenamento ('cached' = True,
+    com as visitas da busca original em 'nodes') sem ir ao solver. solve_items deve gerar os
+    resultados na ordem de entrada. Nada espera por blocos: cada resultado sai assim que a
+    ordem permite; os novos são gravados em uma transação a cada 'chunk_size'.
+    """
+    keys = deque()  # Impressões digitais dos puzzles enviados ao solver, na ordem de entrada
+
+    def lookup(puzzle_id, parsed, error):
+        if error is not None:
+            keys.append(None)
+            return None
+        start_time = time.perf_counter()
+        key = puzzle_fingerprint(*parsed, quad_size)
+        found = store.get_many([key[0]]).get(key[0])
+        if found is None:
+            keys.append(key)
+            return None
+        status, solution, nodes = found
+        return {'id': puzzle_id, 'status': status,
+                'solution': from_canonical(solution, key[1]) if solution is not None else None,
+                'nodes': nodes, 'cached': True, 'time': round(time.perf_counter() - start_time, 6)}
+
+    new_rows = []
+    try:
+        for result in solve_items(puzzles, lookup):
+            if not result.get('cached'):
+                key = keys.popleft()
+                if key is not None and result['status'] in ('solved', 'unsat'):
+                    solution = result['solution']
+                    new_rows.append((key[0], result['status'],
+                                     to_canonical(solution, key[1]) if solution is not None else None,
+                                     result['nodes']))
+                    if len(new_rows) >= chunk_size:
+                        store.put_many(new_rows)
+                        new_rows = []
+            yield result
+    finally:
+        store.put_many(new_rows)
+
+def format_worker_stats(worker_stats):
+    """Resumo por processo: puzzles, visitas, tempo e contagem por status"""
+    return json.dumps({str(pid): dict(stats, time=round(stats['time'], 6))
+                       for pid, stats in sorted(worker_stats.items())})
+
+def add_solver_arguments(parser):
+    """Opções do BackTracker compartilhadas pelos modos em lote"""
+    parser.add_argument('--max-nodes', type=int, default=2000000, help='Limite de visitas por puzzle')
+    parser.add_argument('--propagation', choices=['mac', 'fc'], default='mac', help='Propagação de restrições')
+    parser.add_argument('--alldiff', choices=['pairwise', 'matching'], default='pairwise',
+                        help='Filtro de unicidade das linhas/colunas/quadrantes')
+    parser.add_argument('--no-hidden-singles', action='store_true', help='Desativa o modelo dual (hidden singles)')
+    parser.add_argument('--backjump', action='store_true', help='Backjumping dirigido por conflitos com nogoods')
+    parser.add_argument('--var-order', choices=['mrv', 'dom/wdeg'], default='mrv',
+                        help='Escolha da próxima célula: MRV + grau ou dom/wdeg (pesos aprendidos nos conflitos)')
+    parser.add_argument('--value-order', choices=['lcv', 'ascending'], default='lcv',
+                        help='Ordem dos valores tentados: LCV ou crescente')
+    parser.add_argument('--restarts', choices=['luby', 'geometric'], default=None,
+                        help='Reinícios com desempates aleatórios (orçamentos de visitas Luby ou geométricos)')
+    parser.add_argument('--restart-base', type=int, default=100, help='Visitas da unidade do esquema de reinícios')
+    parser.add_argument('--seed', type=int, default=None, help='Semente dos desempates aleatórios')
+    parser.add_argument('--time-limit', type=float, default=None, help='Limite de tempo por puzzle (segundos)')
+    parser.add_argument('--quad-size', type=int, default=None,
+                        help='Tamanho do quadrante (padrão: deduzido do tamanho; 0 = sem quadrantes)')
+
+def solver_options_from_args(args):
+    return {'max_node_visits': args.max_nodes,
+            'propagation': args.propagation,
+            'alldiff': args.alldiff,
+            'hidden_singles': not args.no_hidden_singles,
+            'backjump': args.backjump,
+            'var_order': args.var_order,
+            'value_order': args.value_order,
+            'restarts': args.restarts,
+            'restart_base': args.restart_base,
+            'seed': args.seed,
+            'time_limit': args.time_limit,
+            'quad_size': args.quad_size}
+
+def main():
+    parser = argparse.ArgumentParser(description='Resolve puzzles de Futoshiki em lote (uma linha JSON por puzzle)')
+    parser.add_argument('source', help="Arquivo JSONL, diretório de arquivos no formato de grade ou '-' (JSONL no stdin)")
+    parser.add_argument('--outfile', type=argparse.FileType('w'), default=sys.stdout,
+                        help='Arquivo de saída JSONL (padrão: stdout)')
+    parser.add_argument('--workers', type=int, default=1, help='Número de processos (padrão: 1, sem pool)')
+    parser.add_argument('--unordered', action='store_true',
+                        help='Com --workers > 1, escreve os resultados à medida que terminam (não na ordem de entrada)')
+    parser.add_argument('--worker-stats', action='store_true',
+                        help='Ao final, escreve no stderr as estatísticas por processo')
+    parser.add_argument('--lru-size', type=int, default=0,
+                        help='Soluções no cache LRU por simetria de cada processo (padrão: 0, sem cache)')
+    parser.add_argument('--cache', type=str, default=None,
+                        help='Arquivo SQLite de resultados persistentes (puzzles já resolvidos não são refeitos)')
+    parser.add_argument('--numpy', action='store_true',
+                        help='Propagação vetorizada (NumPy) de blocos de puzzles antes da busca '
+                             '(em um único processo, sem --workers nem --lru-size)')
+    parser.add_argument('--chunk-size', type=int, default=1024,
+                        help='Puzzles por bloco com --numpy; resultados por transação com --cache')
+    parser.add_argument('--stats', action='store_true',
+                        help='Inclui as estatísticas da busca em cada resultado e escreve o total no stderr '
+                             '(puzzles vindos de cache ou fechados só pela propagação do --numpy não têm estatísticas)')
+    add_solver_arguments(parser)
+    args = parser.parse_args()
+    if args.numpy and (args.workers > 1 or args.lru_size > 0):
+        parser.error("--numpy não pode ser combinado com --workers nem com --lru-size.")
+
+    solver_options = solver_options_from_args(args)
+    puzzles = iter_puzzles(args.source)
+    store = ResultStore(args.cache) if args.cache else None
+    cache = SolutionCache(args.lru_size) if args.lru_size > 0 else None
+
+    def solve_items(items, lookup=None):
+        if args.numpy:
+            return iter_results_numpy(items, solver_options, args.chunk_size, args.stats, lookup)
+        if args.workers > 1:
+            # Com --cache os resultados precisam voltar na ordem de entrada (ver iter_results_stored)
+            return iter_results_parallel(items, solver_options, args.workers,
+                                         ordered=not args.unordered or store is not None, lru_size=args.lru_size,
+                                         with_stats=args.stats, lookup=lookup)
+        return ((lookup and lookup(puzzle_id, parsed, error))
+                or solve_puzzle(puzzle_id, parsed, error, solver_options, cache, args.stats)
+                for puzzle_id, parsed, error in items)
+
+    if store is not None:
+        results = iter_results_stored(puzzles, store, solve_items, solver_options['quad_size'], args.chunk_size)
+    else:
+        results = solve_items(puzzles)
+
+    # Cada resultado é escrito assim que o puzzle é resolvido: memória constante para qualquer entrada
+    worker_stats = defaultdict(lambda: {'puzzles': 0, 'nodes': 0, 'time': 0.0, 'status': defaultdict(int)})
+    solver_stats = SolverStats()  # Soma das estatísticas da busca (--stats)
+    for result in results:
+        args.outfile.write(json.dumps(result) + "\n")
+        args.outfile.flush()
+        stats = worker_stats[result.get('worker', os.getpid())]
+        stats['puzzles'] += 1
+        if not result.get('cached'):  # Visitas do armazenamento não foram feitas nesta execução
+            stats['nodes'] += result.get('nodes', 0)
+        stats['time'] += result.get('time', 0.0)
+        stats['status'][result['status']] += 1
+        if 'stats' in result:
+            solver_stats.merge(SolverStats.from_dict(result['stats']))
+
+    if args.worker_stats:
+        sys.stderr.write(format_worker_stats(worker_stats) + "\n")
+    if args.stats:
+        sys.stderr.write(solver_stats.to_json() + "\n")
+    if store is not None:
+        store.close()
+
+    if args.outfile != sys.stdout:
+        args.outfile.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import queue
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+from futoshiki_generator import random_solution
+from futoshiki_solver import ENGINE_VERSION, BackTracker, default_quad_size
+
+CORPUS_VERSION = 1
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench', f'corpus_v{CORPUS_VERSION}.jsonl')
+
+# Motores comparados: tamanhos aceitos (None: qualquer) e se usam as regras com quadrantes.
+# Os legados têm SIZE = 4 fixo; futoshiki_solver_4x4 e paradigma1 não conhecem quadrantes.
+ENGINES = {
+    'solver': (None, True),
+    'dlx': (None, True),
+    'sat': (None, True),
+    'solver_4x4': ((4,), False),
+    'paradigma1': ((4,), False),
+    'paradigma2': ((4,), True),
+}
+# Módulos de cada motor, importados antes da primeira medição
+ENGINE_MODULES = {'dlx': ['futoshiki_dlx'], 'sat': ['futoshiki_sat'], 'solver_4x4': ['numpy', 'futoshiki_solver_4x4'],
+                  'paradigma1': ['paradigma1'], 'paradigma2': ['paradigma2']}
+
+# Níveis do corpus: (nome, fração de dicas, densidade de desigualdades)
+LEVELS = [('easy', 0.45, 0.35), ('medium', 0.25, 0.3), ('hard', 0.1, 0.25)]
+# Tamanhos do corpus: (tamanho, puzzles por nível, puzzles insatisfazíveis)
+CORPUS_SIZES = [(4, 6, 6), (5, 5, 4), (6, 5, 4), (9, 6, 6), (16, 2, 2)]
+
+def random_puzzle(rng, size, quad_size, givens, density):
+    """Puzzle com solução garantida: dicas e desigualdades tiradas de uma grade aleatória"""
+    solution = random_solution(rng, size, quad_size)
+    puzzle = [[v if rng.random() < givens else 0 for v in row] for row in solution]
+    h_const = {(r, c): int(solution[r][c] > solution[r][c + 1])
+               for r in range(size) for c in range(size - 1) if rng.random() < density}
+    v_const = {(r, c): int(solution[r][c] > solution[r + 1][c])
+               for r in range(size - 1) for c in range(size) if rng.random() < density}
+    return puzzle, h_const, v_const
+
+def build_corpus(seed=CORPUS_VERSION, max_node_visits=100000, unsat_attempts=200):
+    """
+    Gera o corpus versionado: para cada tamanho, puzzles de cada nível e puzzles
+    insatisfazíveis (uma desigualdade invertida até o BackTracker provar a insatisfação;
+    preferindo, em até 'unsat_attempts' tentativas, os que exigem busca e não só propagação).
+    O status esperado e as visitas de referência vêm do BackTracker; puzzles que estouram
+    o limite de visitas são descartados.
+    """
+    from futoshiki_batch import encode_constraints
+
+    rng = random.Random(seed)
+    records = []
+    for size, per_level, n_unsat in CORPUS_SIZES:
+        quad_size = default_quad_size(size)
+        plan = [(name, givens, density, False) for name, givens, density in LEVELS for _ in range(per_level)]
+        plan += [('unsat', LEVELS[2][1], LEVELS[2][2], True)] * n_unsat
+        for level, givens, density, unsat in plan:
+            attempts = 0
+            while True:
+                attempts += 1
+                puzzle, h_const, v_const = random_puzzle(rng, size, quad_size, givens, density)
+                if unsat:
+                    if not h_const:
+                        continue
+                    key = rng.choice(sorted(h_const))
+                    h_const[key] = 1 - h_const[key]
+                solver = BackTracker(puzzle, h_const, v_const, quad_size=quad_size, verbose=False,
+                                     max_node_visits=max_node_visits)
+                solver.solve()
+                if solver.status == ('unsat' if unsat else 'solved') and (
+                        not unsat or solver.node_visits > 1 or attempts >= unsat_attempts):
+                    break
+            records.append({'id': f"{size}x{size}-{level}-{len(records)}", 'size': size, 'level': level,
+                            'expected': solver.status, 'reference_nodes': solver.node_visits,
+                            'puzzle': puzzle, 'h_const': encode_constraints(h_const),
+                            'v_const': encode_constraints(v_const)})
+    return records
+
+def load_corpus(path):
+    from futoshiki_batch import decode_record
+
+    with open(path, 'r') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [(record, decode_record(record)) for record in records]
+
+def check_solution(solution, puzzle, h_const, v_const, quad_size):
+    """True se a grade é uma solução válida do puzzle (com quadrantes se quad_size)"""
+    size = len(puzzle)
+    full = list(range(1, size + 1))
+    units = [[(r, c) for c in range(size)] for r in range(size)]
+    units += [[(r, c) for r in range(size)] for c in range(size)]
+    if quad_size:
+        units += [[(qr + r, qc + c) for r in range(quad_size) for c in range(quad_size)]
+                  for qr in range(0, size, quad_size) for qc in range(0, size, quad_size)]
+    if any(sorted(solution[r][c] for r, c in unit) != full for unit in units):
+        return False
+    if any(puzzle[r][c] and puzzle[r][c] != solution[r][c] for r in range(size) for c in range(size)):
+        return False
+    if any((solution[r][c] > solution[r][c + 1]) != (rel == 1) for (r, c), rel in h_const.items()):
+        return False
+    return all((solution[r][c] > solution[r + 1][c]) == (rel == 1) for (r, c), rel in v_const.items())
+
+def _last_visits(output):
+    """Última contagem 'Visitas: N' impressa por um motor legado (None se não houver)"""
+    found = re.findall(r'Visitas: (\d+)', output)
+    return int(found[-1]) if found else None
+
+def run_engine(engine, puzzle, h_const, v_const):
+    """Executa um motor em um puzzle: retorna (solução ou None, status, visitas)"""
+    if engine in ('solver', 'dlx', 'sat'):
+        if engine == 'solver':
+            solver = BackTracker(puzzle, h_const, v_const, verbose=False)
+        elif engine == 'dlx':
+            from futoshiki_dlx import DLXSolver
+            solver = DLXSolver(puzzle, h_const, v_const, verbose=False)
+        else:
+            from futoshiki_sat import SATSolver
+            solver = SATSolver(puzzle, h_const, v_const, verbose=False)
+        solution = solver.solve()
+        return solution, solver.status, solver.node_visits
+
+    # Motores legados: só imprimem o progresso, então as visitas saem do texto
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        if engine == 'paradigma1':
+            import paradigma1
+            # Resolve recursivo de paradigma1 (o seu ponto de entrada); visitas = chamadas
+            h_symbols = [['>' if h_const.get((r, c)) == 1 else '<' if (r, c) in h_const else 'x'
+                          for c in range(len(puzzle) - 1)] for r in range(len(puzzle))]
+            v_symbols = [['^' if v_const.get((r, c)) == 1 else 'v' if (r, c) in v_const else 'x'
+                          for c in range(len(puzzle))] for r in range(len(puzzle) - 1)]
+            grid = [list(row) for row in puzzle]
+            calls = [0]
+            recursive_solve = paradigma1.solve
+
+            def counted(*args):
+                calls[0] += 1
+                return recursive_solve(*args)
+            paradigma1.solve = counted
+            try:
+                solved = counted(grid, h_symbols, v_symbols)
+            finally:
+                paradigma1.solve = recursive_solve
+            return (grid if solved else None), ('solved' if solved else 'unsat'), calls[0]
+        if engine == 'solver_4x4':
+            import numpy as np
+            import futoshiki_solver_4x4
+            solution = futoshiki_solver_4x4.BackTracker(np.array(puzzle), h_const, v_const).solve()
+        else:
+            import paradigma2
+            solution = paradigma2.BackTracker([list(row) for row in puzzle], h_const, v_const).solve()
+    text = output.getvalue()
+    if solution is not None:
+        status = 'solved'
+        solution = [[int(v) for v in row] for row in solution]
+    else:
+        status = 'limit' if 'Limite' in text else 'unsat'
+    return solution, status, _last_visits(text)
+
+def worker_main(engine, memory, repeat=1):
+    """
+    Processo filho de um motor: lê um registro JSON por linha e responde uma linha JSON com
+    status, visitas, tempo (o menor de 'repeat' execuções) e (com memory) o pico de memória
+    medido com tracemalloc em uma execução à parte, para não inflar o tempo.
+    """
+    from futoshiki_batch import decode_record
+
+    for name in ENGINE_MODULES.get(engine, []):
+        try:
+            __import__(name)
+        except ImportError:
+            pass  # O erro aparece em cada puzzle, com status 'error'
+    for line in sys.stdin:
+        puzzle, h_const, v_const = decode_record(json.loads(line))
+        try:
+            best = None
+            for _ in range(max(repeat, 1)):
+                start_time = time.perf_counter()
+                solution, status, nodes = run_engine(engine, puzzle, h_const, v_const)
+                elapsed = time.perf_counter() - start_time
+                best = elapsed if best is None else min(best, elapsed)
+            result = {'status': status, 'solution': solution, 'nodes': nodes, 'time': best}
+            if memory:
+                tracemalloc.start()
+                run_engine(engine, puzzle, h_const, v_const)
+                result['peak_kb'] = tracemalloc.get_traced_memory()[1] / 1024
+                tracemalloc.stop()
+        except Exception as e:  # Motor quebrado (ou sem numpy) não derruba a rodada
+            result = {'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+        sys.stdout.write(json.dumps(result) + "\n")
+        sys.stdout.flush()
+
+class EngineProcess():
+    """
+    Processo filho que executa um motor puzzle a puzzle. Um puzzle que passa do timeout
+    mata o processo (os motores legados podem entrar em laço infinito); o próximo puzzle
+    abre outro. Os motores ficam isolados do processo da rodada e entre si.
+    """
+    def __init__(self, engine, memory=True, repeat=1):
+        self.engine = engine
+        self.memory = memory
+        self.repeat = repeat
+        self.proc = None
+        self.lines = None
+
+    @staticmethod
+    def _read(proc, lines):
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def _start(self):
+        command = [sys.executable, os.path.abspath(__file__), '--worker', self.engine]
+        if not self.memory:
+            command.append('--no-memory')
+        command += ['--repeat', str(self.repeat)]
+        self.proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+                                     cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.lines = queue.Queue()
+        threading.Thread(target=self._read, args=(self.proc, self.lines), daemon=True).start()
+
+    def run(self, record, timeout):
+        if self.proc is None:
+            self._start()
+        self.proc.stdin.write(json.dumps(record) + "\n")
+        self.proc.stdin.flush()
+        try:
+            line = self.lines.get(timeout=timeout)
+        except queue.Empty:
+            self.close()
+            return {'status': 'timeout', 'time': timeout}
+        if line is None:
+            self.close()
+            return {'status': 'error', 'error': 'processo do motor terminou'}
+        return json.loads(line)
+
+    def close(self):
+        if self.proc is not None:
+            self.proc.kill()
+            self.proc.wait()
+            self.proc = None
+
+def percentile(values, q):
+    """Percentil q (0-100) com interpolação linear; None para lista vazia"""
+    if not values:
+        return None
+    values = sorted(values)
+    pos = (len(values) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (pos - low)
+
+def summarize(results):
+    """Agrupa os resultados por motor e tamanho: status, erros, tempo, visitas e memória"""
+    groups = defaultdict(list)
+    for result in results:
+        groups[f"{result['engine']}/{result['size']}x{result['size']}"].append(result)
+    summary = {}
+    for key, items in sorted(groups.items()):
+        times = [r['time'] for r in items if r['status'] not in ('timeout', 'error')]
+        nodes = [r['nodes'] for r in items if r.get('nodes') is not None]
+        peaks = [r['peak_kb'] for r in items if r.get('peak_kb') is not None]
+        statuses = defaultdict(int)
+        for r in items:
+            statuses[r['status']] += 1
+        summary[key] = {
+            'puzzles': len(items),
+            'status': dict(statuses),
+            'wrong': sum(1 for r in items if r.get('correct') is False),
+            'time_total': sum(times),
+            'time_p50': percentile(times, 50),
+            'time_p90': percentile(times, 90),
+            'time_p99': percentile(times, 99),
+            'time_max': max(times, default=None),
+            'nodes_total': sum(nodes) if nodes else None,
+            'nodes_p50': percentile(nodes, 50),
+            'nodes_p90': percentile(nodes, 90),
+            'nodes_max': max(nodes, default=None),
+            'peak_kb_p50': percentile(peaks, 50),
+            'peak_kb_max': max(peaks, default=None),
+        }
+    return summary
+
+def run_benchmark(corpus, engines, timeout=10.0, memory=True, repeat=1, log=None):
+    """
+    Executa cada motor em cada puzzle do corpus que ele aceita. Cada resultado é conferido:
+    soluções validadas pelas regras do motor; 'unsat' comparado com o esperado do corpus
+    quando o motor usa as mesmas regras (quadrantes) do corpus.
+    """
+    results = []
+    for engine in engines:
+        sizes, quadrants = ENGINES[engine]
+        runner = EngineProcess(engine, memory, repeat)
+        try:
+            for record, (puzzle, h_const, v_const) in corpus:
+                size = len(puzzle)
+                if sizes is not None and size not in sizes:
+                    continue
+                quad_size = default_quad_size(size) if quadrants else 0
+                result = runner.run(record, timeout)
+                correct = None
+                if result['status'] == 'solved':
+                    correct = check_solution(result['solution'], puzzle, h_const, v_const, quad_size)
+                elif result['status'] == 'unsat' and (quadrants or not default_quad_size(size)):
+                    correct = record.get('expected') == 'unsat'
+                result.pop('solution', None)
+                result.update(engine=engine, id=record.get('id'), size=size, level=record.get('level'),
+                              correct=correct)
+                results.append(result)
+                if log is not None:
+                    log(f"{engine} {result['id']}: {result['status']} ({result.get('time', 0):.4f}s)")
+        finally:
+            runner.close()
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Compara com uma rodada anterior (JSON de --output). Em cada grupo (motor/tamanho), só os
+    puzzles terminados nas duas rodadas entram na comparação do tempo mediano e das visitas
+    totais; puzzles que mudaram de status e soluções erradas novas são listados à parte.
+    Retorna (linhas do relatório, número de regressões).
+    """
+    lines = []
+    regressions = 0
+    if baseline.get('corpus_version') != CORPUS_VERSION:
+        lines.append(f"AVISO: baseline do corpus v{baseline.get('corpus_version')}, rodada atual v{CORPUS_VERSION}")
+    finished = ('solved', 'unsat')
+    old_results = {(r['engine'], r['id']): r for r in baseline.get('results', [])}
+    groups = defaultdict(list)
+    for result in results:
+        groups[f"{result['engine']}/{result['size']}x{result['size']}"].append(result)
+    for key, items in sorted(groups.items()):
+        pairs = [(old_results.get((r['engine'], r['id'])), r) for r in items]
+        if all(old is None for old, _ in pairs):
+            lines.append(f"{key}: sem baseline")
+            continue
+        common = [(old, new) for old, new in pairs
+                  if old is not None and old['status'] in finished and new['status'] in finished]
+        notes = [f"{len(common)} em comum"]
+        measures = [('tempo p50', percentile([old['time'] for old, _ in common], 50),
+                     percentile([new['time'] for _, new in common], 50))]
+        if all(old.get('nodes') is not None and new.get('nodes') is not None for old, new in common):
+            measures.append(('visitas', sum(old['nodes'] for old, _ in common), sum(new['nodes'] for _, new in common)))
+        for name, before, after in measures:
+            if not before or after is None:
+                continue
+            change = after / before - 1
+            flag = ''
+            if change > threshold:
+                flag = ' REGRESSÃO'
+                regressions += 1
+            notes.append(f"{name} {before:.6g} -> {after:.6g} ({change:+.1%}){flag}")
+        changed = [f"{new['id']} {old['status']}->{new['status']}" for old, new in pairs
+                   if old is not None and old['status'] != new['status']]
+        if changed:
+            notes.append("status: " + ", ".join(changed))
+        wrong = [new['id'] for old, new in pairs if new.get('correct') is False and (old is None or old.get('correct') is not False)]
+        if wrong:
+            notes.append("erros novos: " + ", ".join(wrong) + " REGRESSÃO")
+            regressions += 1
+        lines.append(f"{key}: " + "; ".join(notes))
+    return lines, regressions
+
+def format_summary(summary):
+    """Tabela do resumo (ok: terminados sem erro; to: timeouts; tempos em ms, memória em KiB)"""
+    def fmt(value, scale=1.0):
+        return '-' if value is None else f"{value * scale:.2f}"
+
+    header = (f"{'grupo':<18} {'n':>4} {'ok':>4} {'erro':>4} {'to':>4} {'p50 ms':>9} {'p90 ms':>9} "
+              f"{'p99 ms':>9} {'visitas p50':>12} {'visitas máx':>12} {'pico KiB':>9}")
+    lines = [header]
+    for key, group in summary.items():
+        statuses = group['status']
+        finished = statuses.get('solved', 0) + statuses.get('unsat', 0) - group['wrong']
+        lines.append(f"{key:<18} {group['puzzles']:>4} {finished:>4} "
+                     f"{group['wrong']:>4} {statuses.get('timeout', 0):>4} {fmt(group['time_p50'], 1000):>9} "
+                     f"{fmt(group['time_p90'], 1000):>9} {fmt(group['time_p99'], 1000):>9} "
+                     f"{fmt(group['nodes_p50']):>12} {fmt(group['nodes_max']):>12} {fmt(group['peak_kb_max']):>9}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dos resolvedores de Futoshiki em um corpus versionado')
+    parser.add_argument('--corpus', type=str, default=DEFAULT_CORPUS, help='Corpus JSONL (padrão: bench/corpus_v1.jsonl)')
+    parser.add_argument('--engines', type=str, default=','.join(ENGINES),
+                        help=f"Motores separados por vírgula (padrão: {','.join(ENGINES)})")
+    parser.add_argument('--sizes', type=str, default=None, help='Tamanhos do corpus a usar, ex.: 4,9')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Tempo máximo por puzzle e motor (segundos)')
+    parser.add_argument('--no-memory', action='store_true', help='Não mede o pico de memória (tracemalloc)')
+    parser.add_argument('--repeat', type=int, default=1, help='Execuções por puzzle (vale o menor tempo)')
+    parser.add_argument('--output', type=str, default=None, help='Grava resumo e resultados em JSON (serve de baseline)')
+    parser.add_argument('--baseline', type=str, default=None, help='JSON de uma rodada anterior para comparação')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Piora relativa tolerada na comparação')
+    parser.add_argument('--build-corpus', action='store_true', help='Gera o corpus em --corpus e termina')
+    parser.add_argument('--seed', type=int, default=CORPUS_VERSION, help='Semente do corpus gerado')
+    parser.add_argument('--verbose', action='store_true', help='Mostra cada puzzle ao terminar')
+    parser.add_argument('--worker', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args.worker, not args.no_memory, args.repeat)
+        return
+
+    if args.build_corpus:
+        records = build_corpus(args.seed)
+        os.makedirs(os.path.dirname(os.path.abspath(args.corpus)), exist_ok=True)
+        with open(args.corpus, 'w', newline='\n') as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        print(f"{len(records)} puzzles gravados em {args.corpus}")
+        return
+
+    engines = [e.strip() for e in args.engines.split(',') if e.strip()]
+    unknown = [e for e in engines if e not in ENGINES]
+    if unknown:
+        parser.error(f"Motores desconhecidos: {', '.join(unknown)}")
+    corpus = load_corpus(args.corpus)
+    if args.sizes:
+        sizes = {int(s) for s in args.sizes.split(',')}
+        corpus = [item for item in corpus if len(item[1][0]) in sizes]
+
+    results = run_benchmark(corpus, engines, args.timeout, not args.no_memory, args.repeat,
+                            log=print if args.verbose else None)
+    summary = summarize(results)
+    print(format_summary(summary))
+
+    regressions = 0
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            lines, regressions = compare(results, json.load(f), args.threshold)
+        print("\n--- Comparação com a baseline ---")
+        print("\n".join(lines))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'corpus_version': CORPUS_VERSION, 'engine_version': ENGINE_VERSION,
+                       'python': platform.python_version(), 'platform': platform.platform(),
+                       'timeout': args.timeout, 'repeat': args.repeat, 'groups': summary, 'results': results}, f, indent=1)
+
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
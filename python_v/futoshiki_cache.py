@@ -0,0 +1,239 @@
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+
+from futoshiki_solver import ENGINE_VERSION, BackTracker, default_quad_size
+
+_TRANSFORM_CACHE = {}  # (size, quad_size) -> lista de transformações (permutação das células, inverte valores)
+
+def get_transforms(size, quad_size):
+    """
+    Simetrias que preservam as regras do puzzle: as 8 do quadrado (rotações, reflexões e
+    transposições; as desigualdades acompanham as células) combinadas com a inversão de
+    valores v -> size + 1 - v (que inverte cada desigualdade). Cada transformação é
+    (perm, invert) com perm[idx] = posição da célula idx no tabuleiro transformado.
+    Quadrantes que não dividem o tabuleiro só admitem a identidade geométrica.
+    """
+    key = (size, quad_size)
+    transforms = _TRANSFORM_CACHE.get(key)
+    if transforms is None:
+        n = size - 1
+        maps = [lambda r, c: (r, c), lambda r, c: (c, n - r), lambda r, c: (n - r, n - c),
+                lambda r, c: (n - c, r), lambda r, c: (c, r), lambda r, c: (r, n - c),
+                lambda r, c: (n - r, c), lambda r, c: (n - c, n - r)]
+        if quad_size and size % quad_size:
+            maps = maps[:1]
+        transforms = []
+        for f in maps:
+            perm = []
+            for idx in range(size * size):
+                r, c = f(*divmod(idx, size))
+                perm.append(r * size + c)
+            transforms.append((perm, False))
+            transforms.append((perm, True))
+        _TRANSFORM_CACHE[key] = transforms
+    return transforms
+
+def _edges(size, h_const, v_const):
+    """Desigualdades como pares (célula maior, célula menor) em índices lineares"""
+    edges = []
+    for (r, c), rel in h_const.items():
+        a, b = r * size + c, r * size + c + 1
+        edges.append((a, b) if rel == 1 else (b, a))
+    for (r, c), rel in v_const.items():
+        a, b = r * size + c, (r + 1) * size + c
+        edges.append((a, b) if rel == 1 else (b, a))
+    return edges
+
+def _transform_key(size, values, edges, perm, invert):
+    """Chave (dicas, h_const, v_const) do puzzle transformado, em tuplas comparáveis"""
+    new_values = [0] * len(values)
+    for idx, v in enumerate(values):
+        new_values[perm[idx]] = (size + 1 - v if invert else v) if v else 0
+    h_items = []
+    v_items = []
+    for greater, smaller in edges:
+        greater, smaller = perm[greater], perm[smaller]
+        if invert:
+            greater, smaller = smaller, greater
+        first = min(greater, smaller)
+        rel = 1 if greater == first else 0
+        if abs(greater - smaller) == 1:
+            h_items.append((divmod(first, size), rel))
+        else:
+            v_items.append((divmod(first, size), rel))
+    return tuple(new_values), tuple(sorted(h_items)), tuple(sorted(v_items))
+
+def canonical_form(puzzle, h_const, v_const, quad_size=None):
+    """
+    Forma canônica do puzzle: a menor chave entre todas as suas simetrias.
+    Retorna (chave, transformação) para desfazer a transformação na solução.
+    """
+    size = len(puzzle)
+    if quad_size is None:
+        quad_size = default_quad_size(size)
+    values = [v for row in puzzle for v in row]
+    edges = _edges(size, h_const, v_const)
+    best = None
+    for perm, invert in get_transforms(size, quad_size):
+        key = _transform_key(size, values, edges, perm, invert)
+        if best is None or key < best[0]:
+            best = (key, (perm, invert))
+    return (size, quad_size) + best[0], best[1]
+
+def to_canonical(grid, transform):
+    """Leva uma grade (solução) do referencial original para o canônico"""
+    perm, invert = transform
+    size = len(grid)
+    values = [0] * (size * size)
+    for idx, v in enumerate(v for row in grid for v in row):
+        values[perm[idx]] = size + 1 - v if invert else v
+    return [values[r * size:(r + 1) * size] for r in range(size)]
+
+def from_canonical(grid, transform):
+    """Inverso de to_canonical: leva a solução canônica de volta ao puzzle original"""
+    perm, invert = transform
+    size = len(grid)
+    values = [v for row in grid for v in row]
+    return [[size + 1 - values[perm[r * size + c]] if invert else values[perm[r * size + c]]
+             for c in range(size)] for r in range(size)]
+
+class SolutionCache():
+    """
+    Cache LRU de soluções na frente do BackTracker. Puzzles repetidos ou equivalentes por
+    simetria (transposto, rotacionado, espelhado, com valores invertidos) caem na mesma
+    entrada e são respondidos sem busca. Só resultados definitivos ('solved' e 'unsat')
+    são guardados; 'limit' e 'stopped' dependem do orçamento e são refeitos.
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()  # Chave canônica -> solução canônica (None: insatisfazível)
+        self.hits = 0
+        self.misses = 0
+        self.last_stats = None  # SolverStats da última busca feita por solve (None: veio do cache)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Solução canônica guardada para a chave; KeyError se ausente"""
+        solution = self.entries[key]
+        self.entries.move_to_end(key)
+        return solution
+
+    def put(self, key, solution):
+        self.entries[key] = solution
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)  # Descarta a menos usada
+
+    def solve(self, puzzle, h_const, v_const, quad_size=None, **solver_options):
+        """
+        Resolve pelo cache ou pelo BackTracker (guardando o resultado).
+        Retorna (solução ou None, status, visitas), com visitas = 0 quando veio do cache.
+        """
+        key, transform = canonical_form(puzzle, h_const, v_const, quad_size)
+        self.last_stats = None
+        try:
+            solution = self.get(key)
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            if solution is None:
+                return None, 'unsat', 0
+            return from_canonical(solution, transform), 'solved', 0
+
+        solver = BackTracker(puzzle, h_const, v_const, quad_size=quad_size, verbose=False, **solver_options)
+        solution = solver.solve()
+        self.last_stats = solver.stats
+        if solver.status == 'solved':
+            self.put(key, to_canonical(solution, transform))
+        elif solver.status == 'unsat':
+            self.put(key, None)
+        return solution, solver.status, solver.node_visits
+
+def puzzle_fingerprint(puzzle, h_const, v_const, quad_size=None):
+    """
+    Impressão digital estável (SHA-256 da forma canônica) do puzzle e a transformação
+    que o leva à forma canônica. Puzzles simétricos têm a mesma impressão digital.
+    """
+    key, transform = canonical_form(puzzle, h_const, v_const, quad_size)
+    return hashlib.sha256(repr(key).encode('ascii')).hexdigest(), transform
+
+class ResultStore():
+    """
+    Resultados persistentes em SQLite, indexados pela impressão digital do puzzle.
+    Guarda a solução (no referencial canônico) ou o veredito de insatisfazível, as visitas e a
+    versão do motor; resultados de outra ENGINE_VERSION são ignorados. O modo WAL permite
+    leituras simultâneas e o timeout espera pelo escritor da vez, então vários processos
+    podem usar o mesmo arquivo. Cada processo deve abrir o seu ResultStore.
+    """
+    BULK_SIZE = 500  # Parâmetros por consulta em get_many (limite de variáveis do SQLite)
+
+    def __init__(self, path, timeout=30.0, engine_version=ENGINE_VERSION):
+        self.path = path
+        self.engine_version = engine_version
+        self.conn = sqlite3.connect(path, timeout=timeout)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS results (
+                                     fingerprint TEXT PRIMARY KEY,
+                                     status TEXT NOT NULL,
+                                     solution TEXT,
+                                     nodes INTEGER NOT NULL,
+                                     engine_version TEXT NOT NULL,
+                                     created REAL NOT NULL)""")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_many(self, fingerprints):
+        """{impressão digital: (status, solução canônica ou None, visitas)} das encontradas"""
+        found = {}
+        fingerprints = list(set(fingerprints))
+        for i in range(0, len(fingerprints), self.BULK_SIZE):
+            chunk = fingerprints[i:i + self.BULK_SIZE]
+            rows = self.conn.execute(
+                "SELECT fingerprint, status, solution, nodes FROM results "
+                f"WHERE engine_version = ? AND fingerprint IN ({', '.join('?' * len(chunk))})",
+                [self.engine_version] + chunk)
+            for fingerprint, status, solution, nodes in rows:
+                found[fingerprint] = (status, json.loads(solution) if solution else None, nodes)
+        return found
+
+    def put_many(self, items):
+        """
+        Grava [(impressão digital, status, solução canônica ou None, visitas), ...] em uma
+        única transação. Só resultados definitivos ('solved' e 'unsat') são gravados.
+        """
+        now = time.time()
+        rows = [(fingerprint, status, json.dumps(solution) if solution is not None else None,
+                 nodes, self.engine_version, now)
+                for fingerprint, status, solution, nodes in items if status in ('solved', 'unsat')]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def get(self, puzzle, h_const, v_const, quad_size=None):
+        """(solução ou None, status, visitas) guardado para o puzzle; None se ausente"""
+        fingerprint, transform = puzzle_fingerprint(puzzle, h_const, v_const, quad_size)
+        found = self.get_many([fingerprint]).get(fingerprint)
+        if found is None:
+            return None
+        status, solution, nodes = found
+        return (from_canonical(solution, transform) if solution is not None else None), status, nodes
+
+    def put(self, puzzle, h_const, v_const, solution, status, nodes, quad_size=None):
+        fingerprint, transform = puzzle_fingerprint(puzzle, h_const, v_const, quad_size)
+        canonical = to_canonical(solution, transform) if solution is not None else None
+        return self.put_many([(fingerprint, status, canonical, nodes)])
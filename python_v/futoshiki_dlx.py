@@ -0,0 +1,278 @@
+import argparse
+import sys
+import time
+
+from futoshiki_solver import SolutionCount, default_quad_size, get_topology, parse_input_file, printlst
+
+class DLXSolver():
+    """
+    Resolvedor alternativo por cobertura exata (Algoritmo X com Dancing Links).
+    Linhas da matriz: atribuições (célula, valor). Colunas: cada célula vazia recebe
+    exatamente um valor e cada valor aparece exatamente uma vez em cada unidade
+    (linha, coluna, quadrante). As desigualdades não cabem na cobertura exata e são
+    verificadas como restrição lateral no momento em que uma linha é escolhida.
+    Mesma interface do BackTracker: solve(), iter_solutions(), count_solutions(),
+    node_visits e status.
+    """
+    def __init__(self, initial_puzzle_list, h_const, v_const, quad_size=None, max_node_visits=2000000,
+                 verbose=True):
+        self.size = len(initial_puzzle_list)
+        self.quad_size = default_quad_size(self.size) if quad_size is None else quad_size
+        self.initial_puzzle = [list(row) for row in initial_puzzle_list]
+        self.topology = get_topology(self.size, self.quad_size, h_const, v_const)
+        self.max_node_visits = max_node_visits
+        self.verbose = verbose
+        self.node_visits = 0
+        self.status = None  # 'solved', 'unsat' ou 'limit'
+
+    def _log(self, message):
+        """Mensagem de progresso (só no modo verbose)"""
+        if self.verbose:
+            print(message)
+
+    def _build(self):
+        """
+        Monta a matriz esparsa. As dicas já cobrem suas colunas, então só entram as células
+        vazias e os pares (unidade, valor) ainda livres; valores incompatíveis com as dicas
+        (mesma unidade, desigualdade com célula fixa, limites das cadeias) nem viram linha.
+        Retorna False se as dicas já são inconsistentes.
+        """
+        topology = self.topology
+        size = self.size
+        n_cells = size * size
+        values = [v for row in self.initial_puzzle for v in row]
+        chain_masks = topology.chain_masks
+        if chain_masks is None:
+            return False  # Ciclo de desigualdades
+
+        # Valores já usados por dicas em cada unidade
+        used = [0] * len(topology.units)
+        for u, unit in enumerate(topology.units):
+            for idx in unit:
+                v = values[idx]
+                if v:
+                    if used[u] >> v & 1:
+                        return False  # Dica repetida na unidade
+                    used[u] |= 1 << v
+        for idx in range(n_cells):
+            v = values[idx]
+            if v and not self._consistent(values, idx, v):
+                return False  # Desigualdade violada entre dicas
+
+        # Colunas: 0 é o cabeçalho; depois células vazias e pares (unidade, valor) livres
+        column_of = {}
+        for idx in range(n_cells):
+            if not values[idx]:
+                column_of[('cell', idx)] = len(column_of) + 1
+        for u in range(len(topology.units)):
+            for v in range(1, size + 1):
+                if not used[u] >> v & 1:
+                    column_of[('unit', u, v)] = len(column_of) + 1
+        n_columns = len(column_of)
+
+        # Nós em vetores paralelos; os nós 0..n_columns são os cabeçalhos das colunas
+        L = list(range(-1, n_columns))
+        R = list(range(1, n_columns + 2))
+        L[0], R[n_columns] = n_columns, 0
+        U = list(range(n_columns + 1))
+        D = list(range(n_columns + 1))
+        C = list(range(n_columns + 1))
+        S = [0] * (n_columns + 1)  # Tamanho de cada coluna
+        row_of = [None] * (n_columns + 1)  # Nó -> (célula, valor)
+
+        for idx in range(n_cells):
+            if values[idx]:
+                continue
+            blocked = 0
+            for u in topology.cell_units[idx]:
+                blocked |= used[u]
+            for v in range(1, size + 1):
+                if blocked >> v & 1 or not chain_masks[idx] >> v & 1 or not self._consistent(values, idx, v):
+                    continue
+                columns = [column_of[('cell', idx)]] + [column_of[('unit', u, v)] for u in topology.cell_units[idx]]
+                first = len(C)
+                for k, col in enumerate(columns):
+                    node = first + k
+                    L.append(first + k - 1 if k else first + len(columns) - 1)
+                    R.append(node + 1 if k < len(columns) - 1 else first)
+                    U.append(U[col])
+                    D.append(col)
+                    D[U[col]] = node
+                    U[col] = node
+                    C.append(col)
+                    S[col] += 1
+                    row_of.append((idx, v))
+
+        self.links = (L, R, U, D, C, S)
+        self.row_of = row_of
+        self.values = values
+        return True
+
+    def _consistent(self, values, idx, v):
+        """Restrição lateral: v em idx respeita as desigualdades com os vizinhos já preenchidos"""
+        for n, greater in self.topology.ineq[idx]:
+            other = values[n]
+            if other and (v <= other if greater else v >= other):
+                return False
+        return True
+
+    def _search(self):
+        """
+        Algoritmo X iterativo. Gerador: produz a lista de valores (o próprio estado, não
+        uma cópia) a cada solução e, se retomado, continua a busca.
+        """
+        L, R, U, D, C, S = self.links
+        row_of = self.row_of
+        values = self.values
+        consistent = self._consistent
+
+        def cover(col):
+            L[R[col]] = L[col]
+            R[L[col]] = R[col]
+            i = D[col]
+            while i != col:
+                j = R[i]
+                while j != i:
+                    U[D[j]] = U[j]
+                    D[U[j]] = D[j]
+                    S[C[j]] -= 1
+                    j = R[j]
+                i = D[i]
+
+        def uncover(col):
+            i = U[col]
+            while i != col:
+                j = L[i]
+                while j != i:
+                    S[C[j]] += 1
+                    U[D[j]] = j
+                    D[U[j]] = j
+                    j = L[j]
+                i = U[i]
+            L[R[col]] = col
+            R[L[col]] = col
+
+        # Pilha de níveis: [coluna escolhida, linha atual (== coluna antes da primeira)]
+        stack = []
+        node_visits = 0
+        max_node_visits = self.max_node_visits
+        descend = True
+        while True:
+            if descend:
+                node_visits += 1
+                self.node_visits = node_visits
+                if node_visits > max_node_visits:
+                    self.status = 'limit'
+                    self._log(f"Limite de {max_node_visits} visitas atingido.")
+                    return
+                if R[0] == 0:
+                    self.status = 'solved'
+                    yield values
+                else:
+                    # Coluna com menos linhas (heurística S do Algoritmo X)
+                    col = R[0]
+                    best, best_size = col, S[col]
+                    while col != 0 and best_size > 1:
+                        if S[col] < best_size:
+                            best, best_size = col, S[col]
+                        col = R[col]
+                    cover(best)
+                    stack.append([best, best])
+                descend = False
+
+            # Próxima linha do nível do topo (ou backtrack se não houver mais)
+            while stack:
+                frame = stack[-1]
+                col, row = frame
+                if row != col:  # Desfaz a linha anterior deste nível
+                    values[row_of[row][0]] = 0
+                    j = L[row]
+                    while j != row:
+                        uncover(C[j])
+                        j = L[j]
+                row = D[row]
+                while row != col and not consistent(values, *row_of[row]):
+                    row = D[row]
+                if row == col:
+                    uncover(col)
+                    stack.pop()
+                    continue
+                frame[1] = row
+                idx, v = row_of[row]
+                values[idx] = v
+                j = R[row]
+                while j != row:
+                    cover(C[j])
+                    j = R[j]
+                descend = True
+                break
+            else:
+                return  # Todos os níveis esgotados
+
+    def _to_grid(self, values):
+        size = self.size
+        return [list(values[r * size:(r + 1) * size]) for r in range(size)]
+
+    def iter_solutions(self, max_solutions=None):
+        """Gera as soluções uma a uma (cópias), como BackTracker.iter_solutions"""
+        self.node_visits = 0
+        self.status = 'unsat'
+        if max_solutions is not None and max_solutions <= 0:
+            return
+        if not self._build():
+            self._log("Puzzle inicial inconsistente.")
+            return
+        count = 0
+        for values in self._search():
+            yield self._to_grid(values)
+            count += 1
+            if max_solutions is not None and count >= max_solutions:
+                return
+
+    def solve(self):
+        """Retorna a primeira solução (lista de listas) ou None; o motivo fica em self.status"""
+        start_time = time.time()
+        for solution in self.iter_solutions(max_solutions=1):
+            elapsed = time.time() - start_time
+            self._log(f"\nSolução encontrada! Visitas: {self.node_visits} (Tempo: {elapsed:.2f}s)")
+            return solution
+        if self.status != 'limit':
+            elapsed = time.time() - start_time
+            self._log(f"\nBusca esgotada sem solução. Visitas: {self.node_visits} (Tempo: {elapsed:.2f}s)")
+        return None
+
+    def count_solutions(self, limit=2):
+        """Conta as soluções parando em 'limit' (None: todas); retorna SolutionCount(count, exact)"""
+        self.node_visits = 0
+        self.status = 'unsat'
+        if not self._build():
+            return SolutionCount(0, True)
+        count = 0
+        for _ in self._search():
+            count += 1
+            if limit is not None and count >= limit:
+                return SolutionCount(count, False)
+        return SolutionCount(count, self.status != 'limit')
+
+def main():
+    parser = argparse.ArgumentParser(description='Resolvedor de Futoshiki por cobertura exata (Dancing Links)')
+    parser.add_argument('--infile', type=str, required=True, help='Arquivo de entrada do puzzle')
+    parser.add_argument('--outfile', type=argparse.FileType('w'), default=sys.stdout,
+                        help='Arquivo de saída da solução (padrão: stdout)')
+    parser.add_argument('--max-nodes', type=int, default=2000000, help='Limite de visitas')
+    args = parser.parse_args()
+
+    puzzle_list, h_const, v_const = parse_input_file(args.infile)
+    solver = DLXSolver(puzzle_list, h_const, v_const, max_node_visits=args.max_nodes)
+    solution = solver.solve()
+    if solution is not None:
+        printlst(solution, args.outfile)
+    else:
+        print("Não foi possível encontrar uma solução.")
+        if args.outfile != sys.stdout:
+            args.outfile.write("Sem solucao\n")
+    if args.outfile != sys.stdout:
+        args.outfile.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from futoshiki_solver import SIZE, BackTracker, default_quad_size, format_puzzle_lines
+
+# Fração das células em que a segunda solução diverge que recebem dica a cada passo: com o
+# puzzle ainda muito aberto, várias dicas por verificação poupam buscas (cerca de 2x em 9x9)
+DIFF_FRACTION = 0.1
+
+def random_solution(rng, size, quad_size):
+    """
+    Grade completa aleatória que respeita linhas, colunas e quadrantes: padrão base com
+    faixas/pilhas de quadrantes, linhas/colunas dentro delas e símbolos embaralhados.
+    Não usa o solver, então a grade depende só do rng (o corpus de futoshiki_bench também
+    é gerado por aqui). Os quadrantes, se houver, devem ter lado sqrt(size) (cada um contém
+    todos os valores, como nas demais unidades); senão levanta ValueError.
+    """
+    if quad_size and quad_size * quad_size != size:
+        raise ValueError(f"Quadrante {quad_size} não tem lado sqrt({size}).")
+    if quad_size:
+        q = quad_size
+        base = [[(q * (r % q) + r // q + c) % size for c in range(size)] for r in range(size)]
+        bands = rng.sample(range(size // q), size // q)
+        rows = [b * q + i for b in bands for i in rng.sample(range(q), q)]
+        stacks = rng.sample(range(size // q), size // q)
+        cols = [b * q + i for b in stacks for i in rng.sample(range(q), q)]
+    else:
+        base = [[(r + c) % size for c in range(size)] for r in range(size)]
+        rows = rng.sample(range(size), size)
+        cols = rng.sample(range(size), size)
+    symbols = rng.sample(range(1, size + 1), size)
+    return [[symbols[base[r][c]] for c in cols] for r in rows]
+
+def _two_solutions(puzzle, h_const, v_const, quad_size, max_node_visits):
+    """Até duas soluções do puzzle; None se a busca estourou o limite antes de decidir"""
+    solver = BackTracker(puzzle, h_const, v_const, quad_size=quad_size, verbose=False,
+                         max_node_visits=max_node_visits)
+    solutions = list(solver.iter_solutions(max_solutions=2))
+    if len(solutions) < 2 and solver.status == 'limit':
+        return None
+    return solutions
+
+def generate_puzzle(rng, size=SIZE, quad_size=None, density=0.25, minimize=False, max_node_visits=100000):
+    """
+    Gera um puzzle com solução única: sorteia a solução, as desigualdades (cada par de
+    vizinhos com probabilidade 'density') e acrescenta dicas até a solução ficar única.
+    A cada passo a busca para na segunda solução; as novas dicas vão em células onde essa
+    outra solução difere da sorteada (DIFF_FRACTION delas, pelo menos uma), o que a
+    elimina. Com minimize, retira depois cada dica dispensável (mais lento: uma
+    verificação de unicidade por dica).
+    Retorna (puzzle, h_const, v_const, solução) ou None se a busca estourou o limite.
+    """
+    if quad_size is None:
+        quad_size = default_quad_size(size)
+    solution = random_solution(rng, size, quad_size)
+    h_const = {(r, c): int(solution[r][c] > solution[r][c + 1])
+               for r in range(size) for c in range(size - 1) if rng.random() < density}
+    v_const = {(r, c): int(solution[r][c] > solution[r + 1][c])
+               for r in range(size - 1) for c in range(size) if rng.random() < density}
+    puzzle = [[0] * size for _ in range(size)]
+
+    while True:
+        solutions = _two_solutions(puzzle, h_const, v_const, quad_size, max_node_visits)
+        if not solutions:
+            return None  # Limite de visitas, ou nenhuma solução (a sorteada deveria valer)
+        if len(solutions) == 1:
+            break
+        other = solutions[0] if solutions[0] != solution else solutions[1]
+        diff = [(r, c) for r in range(size) for c in range(size) if other[r][c] != solution[r][c]]
+        for r, c in rng.sample(diff, max(1, int(len(diff) * DIFF_FRACTION))):
+            puzzle[r][c] = solution[r][c]
+
+    if minimize:
+        givens = [(r, c) for r in range(size) for c in range(size) if puzzle[r][c]]
+        rng.shuffle(givens)
+        for r, c in givens:
+            puzzle[r][c] = 0
+            solutions = _two_solutions(puzzle, h_const, v_const, quad_size, max_node_visits)
+            if solutions is None or len(solutions) != 1:
+                puzzle[r][c] = solution[r][c]
+    return puzzle, h_const, v_const, solution
+
+def iter_puzzles(seed, count, size=SIZE, quad_size=None, density=0.25, minimize=False, max_node_visits=100000):
+    """Gera 'count' puzzles únicos reprodutíveis a partir da semente"""
+    rng = random.Random(seed)
+    generated = 0
+    while generated < count:
+        result = generate_puzzle(rng, size, quad_size, density, minimize, max_node_visits)
+        if result is not None:
+            generated += 1
+            yield result
+
+def main():
+    parser = argparse.ArgumentParser(description='Gerador de puzzles de Futoshiki com solução única')
+    parser.add_argument('--count', type=int, default=1, help='Número de puzzles')
+    parser.add_argument('--size', type=int, default=SIZE, help=f'Tamanho do tabuleiro (padrão: {SIZE})')
+    parser.add_argument('--quad-size', type=int, default=None,
+                        help='Lado do quadrante: sqrt do tamanho ou 0 = sem quadrantes (padrão: deduzido do tamanho)')
+    parser.add_argument('--density', type=float, default=0.25, help='Probabilidade de desigualdade entre vizinhos')
+    parser.add_argument('--minimize', action='store_true', help='Retira as dicas dispensáveis (mais lento)')
+    parser.add_argument('--seed', type=int, default=None, help='Semente (padrão: aleatória)')
+    parser.add_argument('--max-nodes', type=int, default=100000, help='Limite de visitas por verificação')
+    parser.add_argument('--outdir', type=str, default=None,
+                        help='Diretório para um arquivo por puzzle no formato de puzzle.txt')
+    parser.add_argument('--jsonl', type=argparse.FileType('w'), default=None,
+                        help="Arquivo JSONL no formato de futoshiki_batch ('-' para stdout)")
+    args = parser.parse_args()
+
+    quad_size = default_quad_size(args.size) if args.quad_size is None else args.quad_size
+    if quad_size and quad_size * quad_size != args.size:
+        parser.error(f"Quadrante {quad_size} não tem lado sqrt({args.size}): o modelo exige que cada "
+                     f"quadrante contenha todos os valores.")
+    seed = args.seed if args.seed is not None else random.randrange(1 << 30)
+    if args.outdir:
+        os.makedirs(args.outdir, exist_ok=True)
+
+    start_time = time.time()
+    puzzles = iter_puzzles(seed, args.count, args.size, quad_size, args.density, args.minimize, args.max_nodes)
+    for i, (puzzle, h_const, v_const, solution) in enumerate(puzzles):
+        lines = format_puzzle_lines(puzzle, h_const, v_const)
+        puzzle_id = f"{args.size}x{args.size}-{seed}-{i:05d}"
+        if args.outdir:
+            with open(os.path.join(args.outdir, f"{puzzle_id}.txt"), 'w') as f:
+                f.write("\n".join(lines) + "\n")
+        if args.jsonl:
+            args.jsonl.write(json.dumps({'id': puzzle_id, 'text': "\n".join(lines), 'solution': solution}) + "\n")
+        if not args.outdir and not args.jsonl:
+            print("\n".join(lines) + "\n")
+    elapsed = time.time() - start_time
+    sys.stderr.write(f"{args.count} puzzles (semente {seed}) em {elapsed:.2f}s\n")
+    if args.jsonl and args.jsonl != sys.stdout:
+        args.jsonl.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import numpy as np
+
+from futoshiki_solver import BackTracker, default_quad_size
+
+def encode_batch(puzzles, h_consts, v_consts):
+    """
+    Converte uma lista de puzzles do mesmo tamanho N em arrays:
+    domains (B, N, N, N) bool, domains[b, r, c, k] = célula (r, c) do puzzle b aceita o valor k + 1;
+    h_rel (B, N, N - 1) e v_rel (B, N - 1, N) int8: 1 se a célula é maior que a vizinha
+    (direita / de baixo), -1 se é menor, 0 sem restrição.
+    """
+    batch = len(puzzles)
+    size = len(puzzles[0])
+    givens = np.array(puzzles, dtype=np.int16).reshape(batch, size, size)
+    domains = np.where((givens > 0)[..., None], np.arange(1, size + 1) == givens[..., None], True)
+    h_rel = np.zeros((batch, size, max(size - 1, 0)), dtype=np.int8)
+    v_rel = np.zeros((batch, max(size - 1, 0), size), dtype=np.int8)
+    for b, (h_const, v_const) in enumerate(zip(h_consts, v_consts)):
+        for (r, c), rel in h_const.items():
+            if 0 <= r < size and 0 <= c < size - 1:
+                h_rel[b, r, c] = 1 if rel == 1 else -1
+        for (r, c), rel in v_const.items():
+            if 0 <= r < size - 1 and 0 <= c < size:
+                v_rel[b, r, c] = 1 if rel == 1 else -1
+    return domains, h_rel, v_rel
+
+def _unit_views(array, quad_size):
+    """
+    Visões do array (B, N, N, N) em que as unidades ficam em eixos próprios, com os eixos
+    das células de cada unidade: linhas (eixo 2), colunas (eixo 1) e quadrantes (eixos 2 e 4)
+    """
+    views = [(array, (2,)), (array, (1,))]
+    if quad_size:
+        batch, size = array.shape[:2]
+        quads = size // quad_size
+        views.append((array.reshape(batch, quads, quad_size, quads, quad_size, size), (2, 4)))
+    return views
+
+def _propagate_step(domains, h_rel, v_rel, quad_size):
+    """
+    Uma rodada de propagação em todos os puzzles do lote ao mesmo tempo:
+    1. Unicidade: valor fixado em uma célula sai das outras células da unidade.
+    2. Hidden singles: valor com uma única posição na unidade fixa essa célula.
+    3. Desigualdades: a maior só aceita valores acima do mínimo da menor e a menor
+       só aceita valores abaixo do máximo da maior.
+    Retorna (novos domínios, puzzles em contradição).
+    """
+    batch, size = domains.shape[:2]
+    failed = np.zeros(batch, dtype=bool)
+
+    # 1. Unicidade
+    fixed = domains & (domains.sum(axis=-1, keepdims=True) == 1)
+    for view, axes in _unit_views(fixed, quad_size):
+        others = view.sum(axis=axes, keepdims=True) - view  # Outras células da unidade com o valor fixado
+        domains = domains & (others == 0).reshape(domains.shape)
+
+    # 2. Hidden singles (uma célula que é a única posição de dois valores é contradição)
+    hidden = np.zeros_like(domains)
+    for view, axes in _unit_views(domains, quad_size):
+        places = view.sum(axis=axes, keepdims=True)
+        failed |= (places == 0).reshape(batch, -1).any(axis=1)
+        hidden |= (view & (places == 1)).reshape(domains.shape)
+    n_hidden = hidden.sum(axis=-1)
+    failed |= (n_hidden > 1).any(axis=(1, 2))
+    domains = np.where((n_hidden == 1)[..., None], hidden, domains)
+
+    # 3. Desigualdades pelos limites (mínimo / máximo) dos domínios
+    values = np.arange(size)
+    min_v = domains.argmax(axis=-1)
+    max_v = size - 1 - domains[..., ::-1].argmax(axis=-1)
+    for rel, axis in ((h_rel, 2), (v_rel, 1)):
+        if not rel.size:
+            continue
+        first = [slice(None)] * 3
+        second = [slice(None)] * 3
+        first[axis] = slice(None, -1)
+        second[axis] = slice(1, None)
+        first, second = tuple(first), tuple(second)
+        greater = (rel == 1)[..., None]
+        less = (rel == -1)[..., None]
+        # Primeira célula > segunda: primeira > min(segunda) e segunda < max(primeira); e vice-versa
+        keep_first = ~(greater & (values <= min_v[second][..., None])) & ~(less & (values >= max_v[second][..., None]))
+        keep_second = ~(greater & (values >= max_v[first][..., None])) & ~(less & (values <= min_v[first][..., None]))
+        domains = domains.copy()
+        domains[first] &= keep_first
+        domains[second] &= keep_second
+
+    failed |= ~domains.any(axis=-1).all(axis=(1, 2))
+    return domains, failed
+
+def propagate_batch(domains, h_rel, v_rel, quad_size):
+    """
+    Propaga todos os puzzles em passo único (lockstep) até o ponto fixo. A cada rodada só
+    seguem os puzzles que mudaram e ainda não entraram em contradição.
+    Retorna (domínios, failed) com failed[b] = True se o puzzle b é insatisfazível.
+    """
+    domains = domains.copy()
+    failed = np.zeros(len(domains), dtype=bool)
+    active = np.arange(len(domains))
+    while active.size:
+        current = domains[active]
+        new, step_failed = _propagate_step(current, h_rel[active], v_rel[active], quad_size)
+        changed = (new != current).any(axis=(1, 2, 3))
+        domains[active] = new
+        failed[active] |= step_failed
+        active = active[changed & ~step_failed]
+    return domains, failed
+
+def solve_batch(puzzles, h_consts, v_consts, quad_size=None, **solver_options):
+    """
+    Resolve um lote de puzzles do mesmo tamanho. A propagação vetorizada resolve (ou refuta)
+    a maior parte sem busca; só os puzzles que ainda precisam de ramificação vão para o
+    BackTracker, com as células já fixadas pela propagação como dicas.
+    Retorna uma lista de (solução ou None, status, visitas, estatísticas) na ordem de entrada;
+    as estatísticas são o SolverStats da busca, ou None se a propagação bastou.
+    """
+    if not puzzles:
+        return []
+    size = len(puzzles[0])
+    if quad_size is None:
+        quad_size = default_quad_size(size)
+    domains, h_rel, v_rel = encode_batch(puzzles, h_consts, v_consts)
+    domains, failed = propagate_batch(domains, h_rel, v_rel, quad_size)
+
+    counts = domains.sum(axis=-1)
+    solved = ~failed & (counts == 1).all(axis=(1, 2))
+    filled = np.where(counts == 1, domains.argmax(axis=-1) + 1, 0)
+
+    results = []
+    for b in range(len(puzzles)):
+        if failed[b]:
+            results.append((None, 'unsat', 0, None))
+        elif solved[b]:
+            results.append((filled[b].tolist(), 'solved', 0, None))
+        else:
+            solver = BackTracker(filled[b].tolist(), h_consts[b], v_consts[b], quad_size=quad_size,
+                                 verbose=False, **solver_options)
+            solution = solver.solve()
+            results.append((solution, solver.status, solver.node_visits, solver.stats))
+    return results
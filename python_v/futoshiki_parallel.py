@@ -0,0 +1,209 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+from futoshiki_solver import BackTracker, parse_input_file, printlst
+
+MAX_SPLIT_DEPTH = 4  # Níveis da árvore expandidos no máximo pela divisão inicial
+POLL_TIMEOUT = 0.05  # Segundos entre verificações da fila / do sinal de parada
+
+def split_problem(puzzle, h_const, v_const, n_tasks, solver_options):
+    """
+    Divide a busca nos níveis de cima da árvore: expande, nível a nível, os valores da
+    célula MRV de cada subproblema até ter pelo menos n_tasks subproblemas. Células com
+    domínio unitário não ramificam: são atribuídas (entrando no prefixo) até a primeira
+    célula com mais de um valor, e só ela é dividida.
+    Cada subproblema é a lista de atribuições (r, c, valor) a partir da raiz.
+    Retorna (subproblemas, solução encontrada durante a divisão ou None).
+    """
+    tasks = [[]]
+    for _ in range(MAX_SPLIT_DEPTH):
+        if len(tasks) >= n_tasks:
+            break
+        expanded = []
+        for prefix in tasks:
+            solver = BackTracker(puzzle, h_const, v_const, verbose=False, **solver_options)
+            if not solver.prepare(prefix):
+                continue  # Ramo inconsistente: descartado
+            board = solver.root
+            path = list(prefix)
+            while True:
+                if board.is_complete():
+                    return [], board.puzzle
+                board.choose_next_variable()
+                if board.target == (-1, -1):
+                    break
+                r, c = board.target
+                mask = board.masks[r * board.size + c]
+                if mask & (mask - 1):
+                    board.get_ordered_values()
+                    expanded.extend(path + [(r, c, value)] for value in board.target_vals)
+                    break
+                value = mask.bit_length() - 1
+                if not board.assign(r, c, value):
+                    break  # Ramo inconsistente: descartado
+                path.append((r, c, value))
+        tasks = expanded
+    return tasks, None
+
+def split_frames(solver, prefix):
+    """
+    Doação de trabalho (work stealing): retira os valores ainda não tentados do nó mais raso
+    da busca em andamento e os devolve como novos subproblemas. O resolvedor continua só
+    com o valor atual daquele nó.
+    """
+    frames = solver.frames
+    for depth, frame in enumerate(frames):
+        target, target_vals, index = frame[:3]
+        if index + 1 < len(target_vals):
+            path = prefix + [(f[0][0], f[0][1], f[1][f[2]]) for f in frames[:depth]]
+            donated = [path + [(target[0], target[1], value)] for value in target_vals[index + 1:]]
+            frame[1] = target_vals[:index + 1]
+            # Com backjumping, os valores doados não foram refutados aqui: o nó não pode ser pulado
+            frame[4] |= (1 << (depth + 1)) - 2
+            return donated
+    return []
+
+def _worker(puzzle, h_const, v_const, solver_options, task_queue, result_queue, stop, idle, outstanding):
+    """
+    Processo de trabalho: resolve subproblemas da fila até receber None. Quando há processos
+    ociosos e a fila está vazia, doa parte da própria árvore (split_frames).
+    """
+    stats = {'tasks': 0, 'nodes': 0, 'donated': 0}
+    is_idle = False
+    while True:
+        if not is_idle:
+            is_idle = True
+            with idle.get_lock():
+                idle.value += 1
+        try:
+            prefix = task_queue.get(timeout=POLL_TIMEOUT)
+        except queue.Empty:
+            continue
+        if prefix is None:
+            break
+        is_idle = False
+        with idle.get_lock():
+            idle.value -= 1
+
+        if not stop.is_set():
+            def callback(solver):
+                if stop.is_set():
+                    return True
+                if idle.value > 0 and task_queue.empty():
+                    donated = split_frames(solver, prefix)
+                    if donated:
+                        # Conta os novos subproblemas ANTES de publicá-los: o total pendente
+                        # nunca chega a zero enquanto ainda há trabalho
+                        with outstanding.get_lock():
+                            outstanding.value += len(donated)
+                        for task in donated:
+                            task_queue.put(task)
+                        stats['donated'] += len(donated)
+                return False
+
+            solver = BackTracker(puzzle, h_const, v_const, verbose=False, node_callback=callback,
+                                 **solver_options)
+            solution = solver.solve(assumptions=prefix)
+            stats['tasks'] += 1
+            stats['nodes'] += solver.node_visits
+            if solution is not None:
+                stop.set()
+                result_queue.put(('solution', solution))
+            elif solver.status == 'limit':
+                result_queue.put(('limit', prefix))
+        with outstanding.get_lock():
+            outstanding.value -= 1
+
+    result_queue.put(('exit', os.getpid(), stats))
+
+def solve_parallel(puzzle, h_const, v_const, workers=None, tasks_per_worker=4, **solver_options):
+    """
+    Resolve um único puzzle com vários processos. A árvore é dividida nos níveis de cima
+    (split_problem), os subproblemas vão para uma fila compartilhada e processos ociosos
+    recebem trabalho doado pelos ocupados. Todos param assim que um deles acha uma solução.
+    Retorna (solução ou None, info) com info = {'status', 'nodes', 'tasks', 'workers', 'time'}.
+    """
+    workers = workers or os.cpu_count() or 1
+    start_time = time.time()
+    tasks, solution = split_problem(puzzle, h_const, v_const, workers * tasks_per_worker, solver_options)
+    info = {'status': 'solved' if solution is not None else 'unsat', 'nodes': 0, 'tasks': len(tasks),
+            'workers': {}, 'time': 0.0}
+    if solution is not None or not tasks:
+        info['time'] = round(time.time() - start_time, 6)
+        return solution, info
+
+    task_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    idle = multiprocessing.Value('i', 0)
+    outstanding = multiprocessing.Value('i', len(tasks))
+    for task in tasks:
+        task_queue.put(task)
+
+    processes = [multiprocessing.Process(target=_worker,
+                                         args=(puzzle, h_const, v_const, solver_options, task_queue,
+                                               result_queue, stop, idle, outstanding))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    # Espera uma solução ou o fim de todos os subproblemas (incluindo os doados)
+    hit_limit = False
+    finished = False
+    exited = 0
+    while exited < workers:
+        try:
+            message = result_queue.get(timeout=POLL_TIMEOUT)
+        except queue.Empty:
+            message = None
+        if message is not None:
+            if message[0] == 'solution' and solution is None:
+                solution = message[1]
+            elif message[0] == 'limit':
+                hit_limit = True
+            elif message[0] == 'exit':
+                exited += 1
+                info['workers'][str(message[1])] = message[2]
+                info['nodes'] += message[2]['nodes']
+        if not finished and (solution is not None or outstanding.value == 0):
+            finished = True
+            stop.set()
+            for _ in processes:
+                task_queue.put(None)
+
+    for process in processes:
+        process.join()
+    info['tasks'] += sum(w['donated'] for w in info['workers'].values())
+    info['status'] = 'solved' if solution is not None else ('limit' if hit_limit else 'unsat')
+    info['time'] = round(time.time() - start_time, 6)
+    return solution, info
+
+def main():
+    parser = argparse.ArgumentParser(description='Resolve um puzzle difícil de Futoshiki com vários processos')
+    parser.add_argument('--infile', type=str, required=True, help='Arquivo de entrada do puzzle')
+    parser.add_argument('--outfile', type=argparse.FileType('w'), default=sys.stdout,
+                        help='Arquivo de saída da solução (padrão: stdout)')
+    parser.add_argument('--workers', type=int, default=None, help='Número de processos (padrão: núcleos da máquina)')
+    parser.add_argument('--max-nodes', type=int, default=2000000, help='Limite de visitas por subproblema')
+    args = parser.parse_args()
+
+    puzzle_list, h_const, v_const = parse_input_file(args.infile)
+    solution, info = solve_parallel(puzzle_list, h_const, v_const, workers=args.workers,
+                                    max_node_visits=args.max_nodes)
+    print(f"Status: {info['status']} | Visitas: {info['nodes']} | Subproblemas: {info['tasks']} "
+          f"| Tempo: {info['time']:.2f}s")
+    if solution is not None:
+        printlst(solution, args.outfile)
+    else:
+        print("Não foi possível encontrar uma solução.")
+        if args.outfile != sys.stdout:
+            args.outfile.write("Sem solucao\n")
+    if args.outfile != sys.stdout:
+        args.outfile.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+import argparse
+import heapq
+import sys
+import time
+
+from futoshiki_solver import SolutionCount, default_quad_size, get_topology, luby, parse_input_file, printlst
+
+def encode_puzzle(puzzle, topology):
+    """
+    Codifica o tabuleiro em CNF. Variável idx * size + (v - 1) <=> célula idx tem o valor v.
+    Literais: 2 * variável (positivo) e 2 * variável + 1 (negado).
+    Cláusulas: cada célula tem exatamente um valor, cada valor aparece exatamente uma vez
+    em cada unidade, dicas como cláusulas unitárias e, para cada desigualdade a > b,
+    a proibição dos pares (va, vb) com va <= vb. Valores fora dos limites das cadeias
+    de desigualdade (chain_masks) já entram negados.
+    Retorna (número de variáveis, cláusulas) ou None se as desigualdades formam um ciclo.
+    """
+    size = topology.size
+    n_cells = size * size
+    chain_masks = topology.chain_masks
+    if chain_masks is None:
+        return None
+
+    def lit(idx, v, negated=False):
+        return 2 * (idx * size + v - 1) + negated
+
+    clauses = []
+    values = [v for row in puzzle for v in row]
+    for idx in range(n_cells):
+        if values[idx]:
+            clauses.append([lit(idx, values[idx])])
+        clauses.append([lit(idx, v) for v in range(1, size + 1)])
+        for v in range(1, size + 1):
+            if not chain_masks[idx] >> v & 1:
+                clauses.append([lit(idx, v, True)])
+            for w in range(v + 1, size + 1):
+                clauses.append([lit(idx, v, True), lit(idx, w, True)])
+    for unit in topology.units:
+        for v in range(1, size + 1):
+            clauses.append([lit(idx, v) for idx in unit])
+            for i, a in enumerate(unit):
+                for b in unit[i + 1:]:
+                    clauses.append([lit(a, v, True), lit(b, v, True)])
+    for a in range(n_cells):
+        for b, greater in topology.ineq[a]:
+            if greater:  # a > b: proíbe va <= vb (cada aresta aparece uma vez com greater=True)
+                for va in range(1, size + 1):
+                    for vb in range(va, size + 1):
+                        clauses.append([lit(a, va, True), lit(b, vb, True)])
+    return size * n_cells, clauses
+
+class CDCL():
+    """
+    Motor SAT CDCL em Python puro: literais vigiados (dois por cláusula), aprendizado
+    pelo primeiro UIP, heurística VSIDS (heap com entradas preguiçosas), salvamento
+    de fase, reinícios pela sequência de Luby e descarte periódico das cláusulas
+    aprendidas de maior LBD.
+    """
+    RESTART_BASE = 100  # Conflitos por unidade da sequência de Luby
+    VAR_DECAY = 0.95
+
+    def __init__(self, n_vars):
+        self.n_vars = n_vars
+        self.val = [0] * (2 * n_vars)  # Por literal: 1 verdadeiro, -1 falso, 0 livre
+        self.level = [0] * n_vars
+        self.reason = [None] * n_vars
+        self.phase = [True] * n_vars  # Última polaridade (fase salva); começa decidindo célula = valor
+        self.activity = [0.0] * n_vars
+        self.var_inc = 1.0
+        self.heap = [(0.0, v) for v in range(n_vars)]
+        self.watches = [[] for _ in range(2 * n_vars)]
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.learnts = []
+        self.lbd = {}  # id(cláusula aprendida) -> LBD
+        self.max_learnts = 0
+        self.ok = True  # False: conflito no nível 0 (insatisfazível)
+        self.seen = [False] * n_vars
+        self.decisions = 0
+        self.conflicts = 0
+        self.restarts = 0
+
+    def add_clause(self, lits):
+        """Adiciona uma cláusula no nível 0. Retorna False se o problema ficou insatisfazível."""
+        if not self.ok:
+            return False
+        if self.trail_lim:
+            self._backtrack(0)
+        val = self.val
+        clause = []
+        for lit in sorted(set(lits)):
+            if val[lit] == 1 or lit ^ 1 in clause:
+                return True  # Já satisfeita ou tautologia
+            if val[lit] == 0:
+                clause.append(lit)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self._enqueue(clause[0], None)
+            self.ok = self._propagate() is None
+        else:
+            self.watches[clause[0]].append(clause)
+            self.watches[clause[1]].append(clause)
+        return self.ok
+
+    def _enqueue(self, lit, reason):
+        var = lit >> 1
+        self.val[lit] = 1
+        self.val[lit ^ 1] = -1
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(lit)
+
+    def _propagate(self):
+        """Propagação unitária pelos literais vigiados. Retorna a cláusula em conflito ou None."""
+        val = self.val
+        watches = self.watches
+        trail = self.trail
+        while self.qhead < len(trail):
+            false_lit = trail[self.qhead] ^ 1
+            self.qhead += 1
+            watchers = watches[false_lit]
+            watches[false_lit] = kept = []
+            for k, clause in enumerate(watchers):
+                if not clause:
+                    continue  # Cláusula aprendida descartada
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                first = clause[0]
+                if val[first] == 1:
+                    kept.append(clause)
+                    continue
+                for m in range(2, len(clause)):
+                    if val[clause[m]] != -1:
+                        clause[1], clause[m] = clause[m], false_lit
+                        watches[clause[1]].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if val[first] == -1:
+                        kept.extend(watchers[k + 1:])
+                        self.qhead = len(trail)
+                        return clause
+                    self._enqueue(first, clause)
+        return None
+
+    def _bump(self, var):
+        activity = self.activity
+        activity[var] += self.var_inc
+        if activity[var] > 1e100:  # Reescala para evitar overflow
+            self.activity = activity = [a * 1e-100 for a in activity]
+            self.var_inc *= 1e-100
+            self._rebuild_heap()
+        elif self.val[2 * var] == 0:
+            heapq.heappush(self.heap, (-activity[var], var))
+
+    def _rebuild_heap(self):
+        self.heap = [(-self.activity[v], v) for v in range(self.n_vars) if self.val[2 * v] == 0]
+        heapq.heapify(self.heap)
+
+    def _analyze(self, conflict):
+        """
+        Aprendizado pelo primeiro UIP. Retorna (cláusula aprendida com o literal assertivo
+        na posição 0 e o de maior nível na posição 1, nível de retorno).
+        """
+        seen = self.seen
+        level = self.level
+        trail = self.trail
+        current = len(self.trail_lim)
+        learnt = [None]
+        counter = 0
+        lit = None
+        index = len(trail) - 1
+        clause = conflict
+        while True:
+            for q in (clause if lit is None else clause[1:]):
+                var = q >> 1
+                if not seen[var] and level[var] > 0:
+                    seen[var] = True
+                    self._bump(var)
+                    if level[var] == current:
+                        counter += 1
+                    else:
+                        learnt.append(q)
+            while not seen[trail[index] >> 1]:
+                index -= 1
+            lit = trail[index]
+            index -= 1
+            seen[lit >> 1] = False
+            counter -= 1
+            if not counter:
+                break
+            clause = self.reason[lit >> 1]
+        learnt[0] = lit ^ 1
+        for q in learnt[1:]:
+            seen[q >> 1] = False
+
+        if len(learnt) == 1:
+            return learnt, 0
+        best = max(range(1, len(learnt)), key=lambda i: level[learnt[i] >> 1])
+        learnt[1], learnt[best] = learnt[best], learnt[1]
+        return learnt, level[learnt[1] >> 1]
+
+    def _backtrack(self, target_level):
+        if len(self.trail_lim) <= target_level:
+            return
+        val = self.val
+        activity = self.activity
+        heap = self.heap
+        start = self.trail_lim[target_level]
+        for lit in self.trail[start:]:
+            var = lit >> 1
+            val[lit] = val[lit ^ 1] = 0
+            self.reason[var] = None
+            self.phase[var] = not lit & 1
+            heapq.heappush(heap, (-activity[var], var))
+        del self.trail[start:]
+        del self.trail_lim[target_level:]
+        self.qhead = start
+        if len(heap) > 4 * self.n_vars:  # Muitas entradas obsoletas
+            self._rebuild_heap()
+
+    def _pick_branch_var(self):
+        """Variável livre de maior atividade (None se todas estão atribuídas)"""
+        heap = self.heap
+        val = self.val
+        activity = self.activity
+        while heap:
+            neg_act, var = heapq.heappop(heap)
+            if val[2 * var] == 0 and -neg_act == activity[var]:
+                return var
+        for var in range(self.n_vars):  # Heap vazio: confere se sobrou alguma livre
+            if val[2 * var] == 0:
+                return var
+        return None
+
+    def _reduce_db(self):
+        """Descarta metade das cláusulas aprendidas (maior LBD), exceto as que são razão de atribuições"""
+        lbd = self.lbd
+        self.learnts.sort(key=lambda c: lbd[id(c)])
+        keep = self.learnts[:len(self.learnts) // 2]
+        for clause in self.learnts[len(keep):]:
+            locked = self.reason[clause[0] >> 1] is clause and self.val[clause[0]] == 1
+            if locked or lbd[id(clause)] <= 2:
+                keep.append(clause)
+            else:
+                del lbd[id(clause)]
+                clause.clear()  # As listas de vigiados descartam a cláusula vazia
+        self.learnts = keep
+
+    def solve(self, max_decisions=None):
+        """
+        Busca CDCL. Retorna True (satisfazível; modelo em model()), False (insatisfazível)
+        ou None (limite de decisões atingido).
+        """
+        if not self.ok:
+            return False
+        if self._propagate() is not None:
+            self.ok = False
+            return False
+        self.max_learnts = max(self.max_learnts, 2000)
+        restart_index = 1
+        restart_limit = luby(restart_index) * self.RESTART_BASE
+        since_restart = 0
+        while True:
+            conflict = self._propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                since_restart += 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return False
+                learnt, back_level = self._analyze(conflict)
+                self._backtrack(back_level)
+                if len(learnt) == 1:
+                    self._enqueue(learnt[0], None)
+                else:
+                    self.watches[learnt[0]].append(learnt)
+                    self.watches[learnt[1]].append(learnt)
+                    self.learnts.append(learnt)
+                    self.lbd[id(learnt)] = len({self.level[q >> 1] for q in learnt})
+                    self._enqueue(learnt[0], learnt)
+                self.var_inc /= self.VAR_DECAY
+                if since_restart >= restart_limit:
+                    self.restarts += 1
+                    restart_index += 1
+                    restart_limit = luby(restart_index) * self.RESTART_BASE
+                    since_restart = 0
+                    self._backtrack(0)
+            else:
+                if len(self.learnts) - len(self.trail) >= self.max_learnts:
+                    self._reduce_db()
+                    self.max_learnts = int(self.max_learnts * 1.1)
+                var = self._pick_branch_var()
+                if var is None:
+                    return True
+                self.decisions += 1
+                if max_decisions is not None and self.decisions > max_decisions:
+                    return None
+                self.trail_lim.append(len(self.trail))
+                self._enqueue(2 * var + (not self.phase[var]), None)
+
+    def model(self):
+        """Valores das variáveis na última solução (True/False)"""
+        return [self.val[2 * var] == 1 for var in range(self.n_vars)]
+
+class SATSolver():
+    """
+    Resolvedor por SAT: codifica o puzzle em CNF (encode_puzzle) e resolve com o motor CDCL.
+    Mesma interface do BackTracker: solve(), iter_solutions(), count_solutions(),
+    node_visits (aqui, decisões do CDCL) e status. Indicado para as instâncias difíceis
+    em que o backtracking cronológico estoura o limite de visitas.
+    """
+    def __init__(self, initial_puzzle_list, h_const, v_const, quad_size=None, max_node_visits=2000000,
+                 verbose=True):
+        self.size = len(initial_puzzle_list)
+        self.quad_size = default_quad_size(self.size) if quad_size is None else quad_size
+        self.initial_puzzle = [list(row) for row in initial_puzzle_list]
+        self.topology = get_topology(self.size, self.quad_size, h_const, v_const)
+        self.max_node_visits = max_node_visits
+        self.verbose = verbose
+        self.node_visits = 0
+        self.status = None  # 'solved', 'unsat' ou 'limit'
+        self.engine = None  # Motor CDCL da última busca (conflitos, reinícios etc.)
+
+    def _log(self, message):
+        """Mensagem de progresso (só no modo verbose)"""
+        if self.verbose:
+            print(message)
+
+    def _new_engine(self):
+        """Codifica o puzzle em um motor novo; retorna None se o puzzle é trivialmente inconsistente"""
+        encoded = encode_puzzle(self.initial_puzzle, self.topology)
+        if encoded is None:
+            return None
+        n_vars, clauses = encoded
+        engine = CDCL(n_vars)
+        for clause in clauses:
+            if not engine.add_clause(clause):
+                return None
+        return engine
+
+    def iter_solutions(self, max_solutions=None):
+        """
+        Gera as soluções uma a uma: depois de cada modelo, adiciona uma cláusula que o
+        bloqueia e continua com o mesmo motor (as cláusulas aprendidas são reaproveitadas).
+        """
+        self.node_visits = 0
+        self.status = 'unsat'
+        if max_solutions is not None and max_solutions <= 0:
+            return
+        self.engine = engine = self._new_engine()
+        if engine is None:
+            return
+        size = self.size
+        count = 0
+        while True:
+            result = engine.solve(max_decisions=self.max_node_visits)
+            self.node_visits = engine.decisions
+            if result is None:
+                self.status = 'limit'
+                self._log(f"Limite de {self.max_node_visits} decisões atingido.")
+                return
+            if not result:
+                return
+            self.status = 'solved'
+            model = engine.model()
+            true_vars = [var for var in range(engine.n_vars) if model[var]]
+            solution = [[0] * size for _ in range(size)]
+            for var in true_vars:
+                idx, v = divmod(var, size)
+                solution[idx // size][idx % size] = v + 1
+            yield solution
+            count += 1
+            if max_solutions is not None and count >= max_solutions:
+                return
+            if not engine.add_clause([2 * var + 1 for var in true_vars]):
+                return
+
+    def solve(self):
+        """Retorna a solução (lista de listas) ou None; o motivo fica em self.status"""
+        start_time = time.time()
+        for solution in self.iter_solutions(max_solutions=1):
+            elapsed = time.time() - start_time
+            self._log(f"\nSolução encontrada! Decisões: {self.node_visits} | Conflitos: {self.engine.conflicts} "
+                      f"(Tempo: {elapsed:.2f}s)")
+            return solution
+        if self.status != 'limit':
+            elapsed = time.time() - start_time
+            self._log(f"\nInsatisfazível. Decisões: {self.node_visits} (Tempo: {elapsed:.2f}s)")
+        return None
+
+    def count_solutions(self, limit=2):
+        """Conta as soluções parando em 'limit' (None: todas); retorna SolutionCount(count, exact)"""
+        count = 0
+        for _ in self.iter_solutions(max_solutions=limit):
+            count += 1
+        truncated = self.status == 'limit' or (limit is not None and count >= limit)
+        return SolutionCount(count, not truncated)
+
+def main():
+    parser = argparse.ArgumentParser(description='Resolvedor de Futoshiki por SAT (CDCL em Python puro)')
+    parser.add_argument('--infile', type=str, required=True, help='Arquivo de entrada do puzzle')
+    parser.add_argument('--outfile', type=argparse.FileType('w'), default=sys.stdout,
+                        help='Arquivo de saída da solução (padrão: stdout)')
+    parser.add_argument('--max-nodes', type=int, default=2000000, help='Limite de decisões')
+    args = parser.parse_args()
+
+    puzzle_list, h_const, v_const = parse_input_file(args.infile)
+    solver = SATSolver(puzzle_list, h_const, v_const, max_node_visits=args.max_nodes)
+    solution = solver.solve()
+    if solution is not None:
+        printlst(solution, args.outfile)
+    else:
+        print("Não foi possível encontrar uma solução.")
+        if args.outfile != sys.stdout:
+            args.outfile.write("Sem solucao\n")
+    if args.outfile != sys.stdout:
+        args.outfile.close()
+
+if __name__ == "__main__":
+    main()
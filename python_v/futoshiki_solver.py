@@ -1,11 +1,16 @@
 import copy
 import argparse
+import json
+import math
+import random
 import sys
 import time
-from collections import defaultdict
+from collections import deque, namedtuple
+from collections.abc import MutableSet
 
 SIZE = 4  # Define o tamanho do tabuleiro
 QUAD_SIZE = 2  # Define o tamanho do quadrante (2x2)
+ENGINE_VERSION = '1'  # Versão dos resultados do motor (invalida caches persistentes quando muda)
 
 def printlst(lst, f):
     """Formata e imprime a matriz no arquivo/stdout"""
@@ -13,81 +18,606 @@ def printlst(lst, f):
         f.write(" ".join(map(str, row)) + "\n")
     f.write('\n')
 
+# Resultado de BackTracker.count_solutions: exact=False se a contagem parou no limite
+SolutionCount = namedtuple('SolutionCount', ['count', 'exact'])
+
+class SolverStats():
+    """
+    Estatísticas da última busca de um BackTracker (atributo stats, refeito a cada busca):
+    nodes: visitas; decisions: atribuições tentadas pela busca; failures: as que falharam na
+    propagação; backtracks: nós esgotados (subidas na árvore); backjumps: níveis pulados
+    pelo backjumping; max_depth: maior profundidade (níveis de decisão); propagations:
+    propagações até o ponto fixo (a inicial e uma por atribuição, contadas igual com 'mac'
+    e 'fc'); pruned: valores removidos dos domínios por tipo de restrição
+    ('alldiff': unicidade entre vizinhos, 'inequality': desigualdades e cadeias,
+    'hidden_single': valor com uma só posição na unidade, 'matching': filtro de Régin,
+    'nogood': valores descartados por nogoods); solutions, restarts, nogoods e status;
+    tempos em segundos: propagação, escolha da variável, ordenação dos valores e total.
+    """
+    PRUNE_KINDS = ('alldiff', 'inequality', 'hidden_single', 'matching', 'nogood')
+    COUNTERS = ('nodes', 'decisions', 'failures', 'backtracks', 'backjumps', 'propagations',
+                'solutions', 'restarts', 'nogoods')
+    TIMERS = ('time_propagation', 'time_variable_selection', 'time_value_ordering', 'time_total')
+
+    def __init__(self):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        for name in self.TIMERS:
+            setattr(self, name, 0.0)
+        self.max_depth = 0
+        self.pruned = dict.fromkeys(self.PRUNE_KINDS, 0)
+        self.status = None
+
+    def merge(self, other):
+        """Acumula as estatísticas de outra busca (para totais de um lote de puzzles)"""
+        for name in self.COUNTERS + self.TIMERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.max_depth = max(self.max_depth, other.max_depth)
+        for kind, count in other.pruned.items():
+            self.pruned[kind] = self.pruned.get(kind, 0) + count
+        return self
+
+    def to_dict(self):
+        data = {'status': self.status}
+        data.update((name, getattr(self, name)) for name in self.COUNTERS)
+        data['max_depth'] = self.max_depth
+        data['pruned'] = dict(self.pruned)
+        data.update((name, round(getattr(self, name), 6)) for name in self.TIMERS)
+        return data
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        for name in cls.COUNTERS + cls.TIMERS + ('max_depth', 'status'):
+            if name in data:
+                setattr(stats, name, data[name])
+        stats.pruned.update(data.get('pruned', {}))
+        return stats
+
+def default_quad_size(size):
+    """Tamanho do quadrante para um tabuleiro size x size (0 = sem quadrantes)"""
+    if size == SIZE:
+        return QUAD_SIZE
+    q = math.isqrt(size)
+    return q if q * q == size else 0
+
+def luby(i):
+    """i-ésimo termo (a partir de 1) da sequência de Luby: 1 1 2 1 1 2 4 1 1 2 ..."""
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while (1 << k) - 1 != i:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+def mask_values(mask):
+    """Lista (crescente) dos valores presentes em um domínio bitmask (bit v = valor v)"""
+    vals = []
+    while mask:
+        low = mask & -mask
+        vals.append(low.bit_length() - 1)
+        mask ^= low
+    return vals
+
+class _DomainSet(MutableSet):
+    """
+    Domínio de uma célula visto como set, com escrita direta na bitmask do Board:
+    discard, add, -=, |= etc. alteram board.masks (e os buckets do MRV).
+    Operações que criam um novo conjunto (-, |, copy.deepcopy) retornam sets comuns.
+    """
+    __slots__ = ('board', 'idx')
+
+    def __init__(self, board, idx):
+        self.board = board
+        self.idx = idx
+
+    @classmethod
+    def _from_iterable(cls, it):
+        return set(it)
+
+    def __contains__(self, value):
+        return isinstance(value, int) and value > 0 and bool(self.board.masks[self.idx] >> value & 1)
+
+    def __iter__(self):
+        return iter(mask_values(self.board.masks[self.idx]))
+
+    def __len__(self):
+        return self.board.masks[self.idx].bit_count()
+
+    def add(self, value):
+        self.board._set_mask(self.idx, self.board.masks[self.idx] | 1 << value)
+
+    def discard(self, value):
+        if value in self:
+            self.board._set_mask(self.idx, self.board.masks[self.idx] ^ 1 << value)
+
+    def __repr__(self):
+        return repr(set(self))
+
+    def __deepcopy__(self, memo):
+        return set(self)
+
+class _DomainRow():
+    """Linha de Board.domains: células como _DomainSet; atribuir um set troca o domínio"""
+    __slots__ = ('board', 'start', 'size')
+
+    def __init__(self, board, r):
+        self.board = board
+        self.size = board.size
+        self.start = r * board.size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, c):
+        if not -self.size <= c < self.size:
+            raise IndexError(c)
+        return _DomainSet(self.board, self.start + c % self.size)
+
+    def __setitem__(self, c, values):
+        if not -self.size <= c < self.size:
+            raise IndexError(c)
+        mask = 0
+        for v in values:
+            mask |= 1 << v
+        self.board._set_mask(self.start + c % self.size, mask)
+
+    def __iter__(self):
+        return (self[c] for c in range(self.size))
+
+    def __repr__(self):
+        return repr([set(dom) for dom in self])
+
+    def __deepcopy__(self, memo):
+        return [set(dom) for dom in self]
+
+class Topology():
+    """
+    Estrutura imutável do tabuleiro: unidades (linhas, colunas, quadrantes),
+    vizinhos de cada célula e vizinhos de desigualdade.
+    Construída uma única vez por (tamanho, quadrante, layout de restrições)
+    e compartilhada por todos os nós da busca (ver get_topology).
+    As células são indexadas por idx = r * size + c (cells[idx] == (r, c)).
+    """
+    def __init__(self, size, quad_size, h_const, v_const):
+        self.size = size
+        self.quad_size = quad_size
+        self.h_const = h_const
+        self.v_const = v_const
+        self.cells = tuple((r, c) for r in range(size) for c in range(size))
+
+        # Unidades e vizinhos não dependem das desigualdades (cache próprio)
+        self.units, self.cell_units, self.peers, self.unit_pos, self.peer_masks = _unit_structure(size, quad_size)
+
+        # Máscaras de valores: bit v representa o valor v (bit 0 não é usado)
+        self.full_mask = (1 << (size + 1)) - 2
+        # greater_than[v]: valores > v ; less_than[v]: valores < v  (v em 0..size+1)
+        self.greater_than = tuple(self.full_mask & ~((1 << (v + 1)) - 1) for v in range(size + 2))
+        self.less_than = tuple(self.full_mask & ((1 << v) - 1) for v in range(size + 2))
+
+        # Vizinhos de desigualdade: ineq[idx] = ((vizinho, maior), ...)
+        # 'maior' é True se a célula idx deve ser MAIOR que o vizinho
+        ineq = [[] for _ in range(size * size)]
+        for (r, c), rel in h_const.items():
+            if 0 <= r < size and 0 <= c < size - 1:  # Entre (r,c) e (r,c+1)
+                a = r * size + c
+                ineq[a].append((a + 1, rel == 1))
+                ineq[a + 1].append((a, rel != 1))
+        for (r, c), rel in v_const.items():
+            if 0 <= r < size - 1 and 0 <= c < size:  # Entre (r,c) e (r+1,c)
+                a = r * size + c
+                ineq[a].append((a + size, rel == 1))
+                ineq[a + size].append((a, rel != 1))
+        self.ineq = tuple(tuple(n) for n in ineq)
+
+        # Restrições numeradas (pesos do dom/wdeg): as unidades são 0..len(units)-1 e cada
+        # desigualdade ganha o id seguinte. ineq_ids[idx][k] é o id da restrição de ineq[idx][k].
+        self.edge_ids = {}
+        for a in range(size * size):
+            for b, _ in ineq[a]:
+                self.edge_ids.setdefault((min(a, b), max(a, b)), len(self.units) + len(self.edge_ids))
+        self.ineq_ids = tuple(tuple(self.edge_ids[(min(a, b), max(a, b))] for b, _ in ineq[a])
+                              for a in range(size * size))
+        self.n_constraints = len(self.units) + len(self.edge_ids)
+
+        # Limites pelas cadeias de desigualdade (ex.: a<b<c<d => a <= size-3, d >= 4)
+        self.chain_masks = self._compute_chain_masks()
+
+    def shared_unit(self, a, b):
+        """Primeira unidade que contém as células vizinhas a e b"""
+        for u in self.cell_units[a]:
+            if u in self.cell_units[b]:
+                return u
+        return None
+
+    def edge_constraint(self, a, b):
+        """Id da restrição de desigualdade entre as células a e b"""
+        return self.edge_ids[(a, b) if a < b else (b, a)]
+
+    def _compute_chain_masks(self):
+        """
+        Calcula, para cada célula, o caminho crescente mais longo que termina nela
+        (células obrigatoriamente menores) e o que parte dela (células maiores) no DAG
+        das desigualdades. Retorna as máscaras dos valores compatíveis com esses limites,
+        ou None se as desigualdades formam um ciclo (puzzle insolúvel).
+        """
+        n_cells = self.size * self.size
+        smaller = [[n for n, greater in self.ineq[idx] if greater] for idx in range(n_cells)]
+        larger = [[n for n, greater in self.ineq[idx] if not greater] for idx in range(n_cells)]
+
+        # Ordem topológica (Kahn) do menor para o maior
+        pending = [len(smaller[idx]) for idx in range(n_cells)]
+        order = [idx for idx in range(n_cells) if not pending[idx]]
+        for idx in order:  # 'order' cresce durante a iteração
+            for n in larger[idx]:
+                pending[n] -= 1
+                if not pending[n]:
+                    order.append(n)
+        if len(order) < n_cells:
+            return None  # Ciclo de desigualdades
+
+        below = [0] * n_cells  # Tamanho da maior cadeia de células menores
+        for idx in order:
+            for n in smaller[idx]:
+                below[idx] = max(below[idx], below[n] + 1)
+        above = [0] * n_cells  # Tamanho da maior cadeia de células maiores
+        for idx in reversed(order):
+            for n in larger[idx]:
+                above[idx] = max(above[idx], above[n] + 1)
+
+        masks = []
+        for idx in range(n_cells):
+            lo, hi = below[idx] + 1, self.size - above[idx]
+            masks.append(self.full_mask & ~((1 << lo) - 1) & ((1 << (hi + 1)) - 1) if lo <= hi else 0)
+        return tuple(masks)
+
+
+_UNIT_CACHE = {}
+_TOPOLOGY_CACHE = {}
+_TOPOLOGY_CACHE_MAX = 256  # Limita a memória em lotes com muitos layouts diferentes
+
+
+def _unit_structure(size, quad_size):
+    """
+    Retorna (units, cell_units, peers, unit_pos, peer_masks) para um tamanho de tabuleiro, com células indexadas.
+    units: tupla de unidades (cada uma uma tupla de índices de células)
+    cell_units: cell_units[idx] = índices das unidades que contêm a célula
+    peers: peers[idx] = células que compartilham alguma unidade (sem a própria)
+    unit_pos: unit_pos[idx] = ((unidade, bit da posição da célula na unidade), ...) - usado pelo modelo dual
+    peer_masks: peer_masks[idx] = peers[idx] como bitmask de células (bit idx = célula idx)
+    """
+    key = (size, quad_size)
+    cached = _UNIT_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    units = []
+    for r in range(size):  # Linhas
+        units.append(tuple(r * size + c for c in range(size)))
+    for c in range(size):  # Colunas
+        units.append(tuple(r * size + c for r in range(size)))
+    if quad_size:  # Quadrantes
+        for qr in range(0, size, quad_size):
+            for qc in range(0, size, quad_size):
+                units.append(tuple(r * size + c for r in range(qr, qr + quad_size)
+                                   for c in range(qc, qc + quad_size)))
+
+    cell_units = [[] for _ in range(size * size)]
+    for u, unit in enumerate(units):
+        for idx in unit:
+            cell_units[idx].append(u)
+
+    peers = []
+    for idx in range(size * size):
+        cell_peers = set()
+        for u in cell_units[idx]:
+            cell_peers.update(units[u])
+        cell_peers.discard(idx)
+        peers.append(tuple(sorted(cell_peers)))
+
+    unit_pos = tuple(tuple((u, 1 << units[u].index(idx)) for u in cell_units[idx])
+                     for idx in range(size * size))
+
+    peer_masks = tuple(sum(1 << p for p in cell_peers) for cell_peers in peers)
+
+    cached = (tuple(units), tuple(tuple(us) for us in cell_units), tuple(peers), unit_pos, peer_masks)
+    _UNIT_CACHE[key] = cached
+    return cached
+
+
+def get_topology(size, quad_size, h_const, v_const):
+    """Retorna a Topology (compartilhada) para o layout dado, criando-a se necessário"""
+    key = (size, quad_size, frozenset(h_const.items()), frozenset(v_const.items()))
+    topology = _TOPOLOGY_CACHE.get(key)
+    if topology is None:
+        if len(_TOPOLOGY_CACHE) >= _TOPOLOGY_CACHE_MAX:
+            _TOPOLOGY_CACHE.pop(next(iter(_TOPOLOGY_CACHE)))  # Descarta a mais antiga
+        topology = Topology(size, quad_size, h_const, v_const)
+        _TOPOLOGY_CACHE[key] = topology
+    return topology
+
+
 class BackTracker():
     class Board():
-        def __init__(self, puzzle_list, h_const, v_const, parent=None):
-            self.size = SIZE
-            self.quad_size = QUAD_SIZE
+        def __init__(self, puzzle_list, h_const, v_const, parent=None, topology=None, propagation='mac',
+                     hidden_singles=True, alldiff='pairwise', quad_size=None, value_order='lcv'):
+            if topology is not None:
+                self.size = topology.size
+                self.quad_size = topology.quad_size
+            else:
+                self.size = len(puzzle_list)
+                self.quad_size = default_quad_size(self.size) if quad_size is None else quad_size
             self.puzzle = puzzle_list
             self.h_const = h_const
             self.v_const = v_const
             self.parent = parent
             self.children = []  # Manter rastreio pode ser útil para debug, mas não essencial para o solve
 
-            self.domains = None  # Será inicializado depois
+            self.masks = None  # Domínios como bitmasks (lista plana indexada por idx), inicializado depois
+            # MRV incremental: buckets[k] = bitset (bit idx) das células não atribuídas com domínio de
+            # tamanho k; open_count[0] = número de células não atribuídas (lista para caber no trail)
+            self.buckets = None
+            self.open_count = None
+            self.trail = None  # Registro de alterações (modo trail); None = sem registro (modo cópia)
+            self.propagation = propagation  # 'mac' (consistência de arco) ou 'fc' (forward checking)
+            self.hidden_singles = hidden_singles  # Usa o modelo dual valor -> posições (hidden singles)
+            self.places = None  # Modelo dual (ver _init_places); None = desativado
+            self.forced = []  # Hidden singles pendentes: (célula, bit do valor, unidade)
+            self.alldiff = alldiff  # 'pairwise' (só arcos binários) ou 'matching' (filtro global de Régin)
+            self.matchings = None  # Último emparelhamento de cada unidade (só dica para o próximo filtro)
             self.target = None  # Próxima célula a preencher
             self.target_vals = []  # Valores a tentar para self.target
             self.target_index = 0  # Índice do valor atual em self.target_vals
+            self.value_order = value_order  # 'lcv' ou 'ascending' (ver get_ordered_values)
+            # Backjumping: expl[idx] = bitset dos níveis de decisão responsáveis pelas podas no
+            # domínio de idx (None = desativado); conflict = níveis responsáveis pela última falha
+            self.expl = None
+            self.conflict = 0
+            self.level = 0  # Nível de decisão corrente (0 = dicas e suposições)
+            self.rng = None  # random.Random para desempates aleatórios (None = determinístico)
+            self.weights = None  # (dom/wdeg) Peso de cada restrição, compartilhado com o BackTracker
+            # Estatísticas da busca: a raiz cria, os filhos (modo cópia) compartilham as do pai
+            self.stats = parent.stats if parent is not None else SolverStats()
 
-            # Cache das células afetadas por uma atribuição (otimização)
-            self._affected_cells_cache = self._compute_affected_cells()
+            # Topologia compartilhada (vizinhos, unidades, desigualdades) - não é recalculada por nó
+            if topology is None:
+                topology = get_topology(self.size, self.quad_size, h_const, v_const)
+            self.topology = topology
 
-        def _compute_affected_cells(self):
+        @property
+        def domains(self):
             """
-            Pré-computa e armazena o conjunto de células afetadas (linha, coluna, quadrante)
-            por cada célula (r, c). Inclui as células de restrição de desigualdade.
-            Retorna um dicionário: {(r, c): set_of_affected_cells}
+            Domínios como lista de linhas de sets (visão de compatibilidade sobre self.masks).
+            A visão escreve direto nas bitmasks: tanto alterações no lugar quanto atribuições
+            valem (o modelo dual, se ativo, não é atualizado; prepare o reconstrói).
+
+            >>> board = BackTracker([[0] * 4 for _ in range(4)], {}, {}, verbose=False).root
+            >>> board.initialize_domains()
+            True
+            >>> board.domains[0][0].discard(1)
+            >>> board.domains[0][1] -= {2, 3}
+            >>> board.domains[0][2] = {3}
+            >>> [sorted(dom) for dom in board.domains[0]][:3]
+            [[2, 3, 4], [1, 4], [3]]
+            >>> board.masks[2] == 1 << 3
+            True
             """
-            affected = defaultdict(set)
-            for r in range(self.size):
-                for c in range(self.size):
-                    coords = (r, c)
-
-                    # 1. Linha (excluindo a própria célula)
-                    affected[coords].update((r, col) for col in range(self.size) if col != c)
-
-                    # 2. Coluna (excluindo a própria célula)
-                    affected[coords].update((row, c) for row in range(self.size) if row != r)
-
-                    # 3. Quadrante 2x2 (excluindo a própria célula)
-                    start_row = (r // self.quad_size) * self.quad_size
-                    start_col = (c // self.quad_size) * self.quad_size
-                    for qr in range(start_row, start_row + self.quad_size):
-                        for qc in range(start_col, start_col + self.quad_size):
-                            if (qr, qc) != coords:
-                                affected[coords].add((qr, qc))
-
-                    # 4. Desigualdade Horizontal (célula adjacente)
-                    if c > 0 and (r, c - 1) in self.h_const:  # Restrição à esquerda
-                        affected[coords].add((r, c - 1))
-                    if c < self.size - 1 and (r, c) in self.h_const:  # Restrição à direita
-                        affected[coords].add((r, c + 1))
-
-                    # 5. Desigualdade Vertical (célula adjacente)
-                    if r > 0 and (r - 1, c) in self.v_const:  # Restrição acima
-                        affected[coords].add((r - 1, c))
-                    if r < self.size - 1 and (r, c) in self.v_const:  # Restrição abaixo
-                        affected[coords].add((r + 1, c))
-
-            return affected
+            if self.masks is None:
+                return None
+            return [_DomainRow(self, r) for r in range(self.size)]
+
+        @domains.setter
+        def domains(self, domains):
+            if domains is None:
+                self.masks = None
+                return
+            masks = []
+            for row in domains:
+                for dom in row:
+                    mask = 0
+                    for v in dom:
+                        mask |= 1 << v
+                    masks.append(mask)
+            self.masks = masks
+            self._init_buckets()
+
+        def _set_mask(self, idx, mask):
+            """Troca o domínio de idx por 'mask' (escrita pela visão domains)"""
+            old = self.masks[idx]
+            if mask != old:
+                if self.trail is not None:
+                    self.trail.append((self.masks, idx, old))
+                self.masks[idx] = mask
+                self._resize(idx, old, mask)
 
         def initialize_domains(self):
-            """Inicializa os domínios de todas as células"""
-            self.domains = [[set(range(1, self.size + 1)) if self.puzzle[r][c] == 0 else {self.puzzle[r][c]}
-                             for c in range(self.size)] for r in range(self.size)]
+            """
+            Inicializa os domínios de todas as células, já restritos pelos limites das
+            cadeias de desigualdade. Retorna False se algum domínio nasce vazio.
+            """
+            chain_masks = self.topology.chain_masks
+            if chain_masks is None:
+                return False  # Ciclo de desigualdades
+            full = self.topology.full_mask
+            self.masks = [(full if self.puzzle[r][c] == 0 else (1 << self.puzzle[r][c]) & full) & chain_masks[idx]
+                          for idx, (r, c) in enumerate(self.topology.cells)]
+            self.stats.pruned['inequality'] += sum((full & ~chain_masks[idx]).bit_count()
+                                                   for idx, (r, c) in enumerate(self.topology.cells)
+                                                   if self.puzzle[r][c] == 0)
+            self._init_buckets()
+            return all(self.masks)
+
+        def _init_buckets(self):
+            """Monta os buckets do MRV incremental e o contador de células não atribuídas"""
+            buckets = [0] * (self.size + 1)
+            open_count = 0
+            for idx, (r, c) in enumerate(self.topology.cells):
+                if self.puzzle[r][c] == 0:
+                    buckets[self.masks[idx].bit_count()] |= 1 << idx
+                    open_count += 1
+            self.buckets = buckets
+            self.open_count = [open_count]
+
+        def _resize(self, idx, old, new):
+            """
+            Domínio de idx passou de 'old' para 'new': move a célula (se não atribuída) para o
+            bucket do novo tamanho. As alterações vão para o trail como qualquer outra.
+            """
+            buckets = self.buckets
+            bit = 1 << idx
+            k = old.bit_count()
+            if buckets[k] & bit:
+                j = new.bit_count()
+                trail = self.trail
+                if trail is not None:
+                    trail.append((buckets, k, buckets[k]))
+                    trail.append((buckets, j, buckets[j]))
+                buckets[k] ^= bit
+                buckets[j] |= bit
+
+        def _init_places(self):
+            """
+            Inicializa o modelo dual: places[u * (size + 1) + v] é a máscara das posições
+            da unidade u (bit p = u-ésima célula units[u][p]) que ainda aceitam o valor v.
+            Valores que já nascem com uma única posição entram em self.forced.
+            Retorna False se algum valor não tem posição em alguma unidade.
+            """
+            topology = self.topology
+            stride = self.size + 1
+            masks = self.masks
+            places = [0] * (len(topology.units) * stride)
+            for u, unit in enumerate(topology.units):
+                for p, idx in enumerate(unit):
+                    mask = masks[idx]
+                    while mask:
+                        low = mask & -mask
+                        mask ^= low
+                        places[u * stride + low.bit_length() - 1] |= 1 << p
+            self.places = places
+            self.forced = []
+            for u, unit in enumerate(topology.units):
+                for v in range(1, stride):
+                    pl = places[u * stride + v]
+                    if not pl:
+                        return False  # Valor sem posição possível na unidade
+                    if not pl & (pl - 1):
+                        self.forced.append((unit[pl.bit_length() - 1], 1 << v, u))
             return True
 
         def apply_initial_consistency(self):
             """Aplica consistência inicial baseada nas células pré-preenchidas"""
-            for r in range(self.size):
-                for c in range(self.size):
-                    if self.puzzle[r][c] != 0:
-                        # Se a célula já tem valor, seu domínio deve ser apenas ele
-                        value = self.puzzle[r][c]
-                        self.domains[r][c] = {value}
-                        # Propaga a restrição deste valor para os vizinhos
-                        if not self._propagate_constraints(r, c, value):
-                            return False  # Inconsistência inicial
+            self.stats.propagations += 1
+            if self.hidden_singles and not self._init_places():
+                return False
+
+            if self.propagation == 'mac':
+                # Os domínios das células preenchidas já são unitários: estabelece consistência de arco global
+                return self._propagate_mac(range(len(self.masks)))
+
+            for r, c in self.topology.cells:
+                if self.puzzle[r][c] != 0:
+                    # Propaga a restrição deste valor para os vizinhos
+                    if not self._propagate_constraints(r, c, self.puzzle[r][c]):
+                        return False  # Inconsistência inicial
+            return self._propagate_forced()
+
+        def _channel(self, idx, removed):
+            """
+            Atualiza o modelo dual depois que os valores em 'removed' saíram do domínio de idx.
+            Quando um valor fica com uma única posição possível em uma unidade (hidden single),
+            a célula correspondente é enfileirada em self.forced para receber esse valor.
+            Retorna False se algum valor ficou sem posição em alguma unidade.
+            """
+            topology = self.topology
+            places = self.places
+            trail = self.trail
+            stride = self.size + 1
+            unit_pos = topology.unit_pos[idx]
+            while removed:
+                low = removed & -removed
+                removed ^= low
+                v = low.bit_length() - 1
+                for u, pos_bit in unit_pos:
+                    k = u * stride + v
+                    pl = places[k]
+                    if pl & pos_bit:
+                        if trail is not None:
+                            trail.append((places, k, pl))
+                        pl ^= pos_bit
+                        places[k] = pl
+                        if not pl:
+                            if self.expl is not None:
+                                self.conflict = self._unit_reason(u)
+                            self._bump_weight(u)
+                            return False  # Valor sem posição na unidade -> Inconsistência
+                        if not pl & (pl - 1):
+                            self.forced.append((topology.units[u][pl.bit_length() - 1], low, u))
+            return True
+
+        def _unit_reason(self, u):
+            """(Backjumping) Níveis de decisão responsáveis pelas podas nas células da unidade u"""
+            expl = self.expl
+            reason = 0
+            for idx in self.topology.units[u]:
+                reason |= expl[idx]
+            return reason
+
+        def _explain(self, idx, reason):
+            """(Backjumping) Acrescenta 'reason' à explicação do domínio de idx, registrando no trail"""
+            expl = self.expl
+            old = expl[idx]
+            if reason & ~old:
+                if self.trail is not None:
+                    self.trail.append((expl, idx, old))
+                expl[idx] = old | reason
+
+        def _fail(self, idx, constraint):
+            """
+            Domínio de idx esvaziado pela restrição 'constraint'. Com backjumping, o conflito é
+            a explicação desse domínio; com dom/wdeg, a restrição ganha peso. Retorna False.
+            """
+            if self.expl is not None:
+                self.conflict = self.expl[idx]
+            self._bump_weight(constraint)
+            return False
+
+        def _bump_weight(self, constraint):
+            """(dom/wdeg) Aumenta o peso de uma restrição que causou um domínio vazio"""
+            if self.weights is not None:
+                self.weights[constraint] += 1
+
+        def _propagate_forced(self):
+            """
+            (Forward checking) Fixa as células apontadas pelo modelo dual (hidden singles) e
+            propaga a partir delas. Retorna False em caso de inconsistência.
+            """
+            forced = self.forced
+            masks = self.masks
+            expl = self.expl
+            while forced:
+                q, bit, u = forced.pop()
+                mq = masks[q]
+                if expl is not None and mq != bit:
+                    self._explain(q, self._unit_reason(u))
+                if not mq & bit:
+                    return self._fail(q, u)
+                if mq != bit:
+                    if self.trail is not None:
+                        self.trail.append((masks, q, mq))
+                    masks[q] = bit
+                    self._resize(q, mq, bit)
+                    self.stats.pruned['hidden_single'] += (mq ^ bit).bit_count()
+                    if not self._channel(q, mq ^ bit):
+                        return False
+                qr, qc = self.topology.cells[q]
+                if not self._propagate_constraints(qr, qc, bit.bit_length() - 1):
+                    return False
             return True
 
         def _propagate_constraints(self, r, c, assigned_value):
@@ -97,206 +627,960 @@ class BackTracker():
             Também aplica restrições de desigualdade se o vizinho ainda não foi atribuído.
             Retorna True se consistente, False se algum domínio ficou vazio.
             """
+            idx = r * self.size + c
+            if self.propagation == 'mac':
+                return self._propagate_mac((idx,))
+
+            topology = self.topology
+            cells = topology.cells
+            masks = self.masks
+            puzzle = self.puzzle
+            trail = self.trail
+            dual = self.places is not None
+            expl = self.expl
+            bit = 1 << assigned_value
+            pruned = self.stats.pruned
+
             # 1. Propagação de Unicidade (Linha, Coluna, Quadrante)
-            for ar, ac in self._affected_cells_cache[(r, c)]:
+            for p in topology.peers[idx]:
                 # Só propaga se o vizinho ainda não tem valor E se o valor atribuido está no domínio do vizinho
-                if self.puzzle[ar][ac] == 0 and assigned_value in self.domains[ar][ac]:
-                    # Verifica se estão na mesma linha, coluna ou quadrante
-                    in_same_row = (r == ar)
-                    in_same_col = (c == ac)
-                    in_same_quad = (r // self.quad_size == ar // self.quad_size) and \
-                                   (c // self.quad_size == ac // self.quad_size)
-
-                    if in_same_row or in_same_col or in_same_quad:
-                        self.domains[ar][ac].discard(assigned_value)
-                        if not self.domains[ar][ac]:
-                            return False  # Domínio vazio -> Inconsistência
+                if masks[p] & bit:
+                    ar, ac = cells[p]
+                    if puzzle[ar][ac] == 0:
+                        if trail is not None:
+                            trail.append((masks, p, masks[p]))
+                        masks[p] ^= bit
+                        self._resize(p, masks[p] | bit, masks[p])
+                        pruned['alldiff'] += 1
+                        if expl is not None:
+                            self._explain(p, expl[idx])
+                        if not masks[p]:
+                            return self._fail(p, topology.shared_unit(idx, p))  # Domínio vazio -> Inconsistência
+                        if dual and not self._channel(p, bit):
+                            return False
 
             # 2. Propagação de Desigualdades (para vizinhos *não preenchidos*)
-            # Horizontal - Vizinho à Direita (r, c+1)
-            if c < self.size - 1 and (r, c) in self.h_const:
-                ar, ac = r, c + 1
-                if self.puzzle[ar][ac] == 0:  # Se vizinho não preenchido
-                    ineq = self.h_const[(r, c)]  # Restrição entre (r,c) e (r,c+1)
-                    vals_to_remove = set()
-                    if ineq == 1:  # (r,c) > (r,c+1)  => assigned_value > vizinho
-                        vals_to_remove = {v for v in self.domains[ar][ac] if v >= assigned_value}
-                    else:  # (r,c) < (r,c+1)  => assigned_value < vizinho
-                        vals_to_remove = {v for v in self.domains[ar][ac] if v <= assigned_value}
-                    if vals_to_remove:
-                        self.domains[ar][ac] -= vals_to_remove
-                        if not self.domains[ar][ac]: return False
-
-            # Horizontal - Vizinho à Esquerda (r, c-1)
-            if c > 0 and (r, c - 1) in self.h_const:
-                ar, ac = r, c - 1
-                if self.puzzle[ar][ac] == 0:
-                    ineq = self.h_const[(r, c - 1)]  # Restrição entre (r,c-1) e (r,c)
-                    vals_to_remove = set()
-                    if ineq == 1:  # (r,c-1) > (r,c)  => vizinho > assigned_value
-                        vals_to_remove = {v for v in self.domains[ar][ac] if v <= assigned_value}
-                    else:  # (r,c-1) < (r,c)  => vizinho < assigned_value
-                        vals_to_remove = {v for v in self.domains[ar][ac] if v >= assigned_value}
-                    if vals_to_remove:
-                        self.domains[ar][ac] -= vals_to_remove
-                        if not self.domains[ar][ac]: return False
-
-            # Vertical - Vizinho Abaixo (r+1, c)
-            if r < self.size - 1 and (r, c) in self.v_const:
-                ar, ac = r + 1, c
-                if self.puzzle[ar][ac] == 0:
-                    ineq = self.v_const[(r, c)]  # Restrição entre (r,c) e (r+1,c)
-                    vals_to_remove = set()
-                    if ineq == 1:  # (r,c) > (r+1,c) (^ na interface) => assigned_value > vizinho
-                        vals_to_remove = {v for v in self.domains[ar][ac] if v >= assigned_value}
-                    else:  # (r,c) < (r+1,c) (v na interface) => assigned_value < vizinho
-                        vals_to_remove = {v for v in self.domains[ar][ac] if v <= assigned_value}
-                    if vals_to_remove:
-                        self.domains[ar][ac] -= vals_to_remove
-                        if not self.domains[ar][ac]: return False
-
-            # Vertical - Vizinho Acima (r-1, c)
-            if r > 0 and (r - 1, c) in self.v_const:
-                ar, ac = r - 1, c
-                if self.puzzle[ar][ac] == 0:
-                    ineq = self.v_const[(r - 1, c)]  # Restrição entre (r-1,c) e (r,c)
-                    vals_to_remove = set()
-                    if ineq == 1:  # (r-1,c) > (r,c) (^ na interface) => vizinho > assigned_value
-                        vals_to_remove = {v for v in self.domains[ar][ac] if v <= assigned_value}
-                    else:  # (r-1,c) < (r,c) (v na interface) => vizinho < assigned_value
-                        vals_to_remove = {v for v in self.domains[ar][ac] if v >= assigned_value}
-                    if vals_to_remove:
-                        self.domains[ar][ac] -= vals_to_remove
-                        if not self.domains[ar][ac]: return False
+            changed = []
+            for n, greater in topology.ineq[idx]:
+                ar, ac = cells[n]
+                if puzzle[ar][ac] == 0:  # Se vizinho não preenchido
+                    if greater:  # (r,c) > vizinho  => vizinho só pode ter valores < assigned_value
+                        new_mask = masks[n] & topology.less_than[assigned_value]
+                    else:  # (r,c) < vizinho  => vizinho só pode ter valores > assigned_value
+                        new_mask = masks[n] & topology.greater_than[assigned_value]
+                    if new_mask != masks[n]:
+                        if trail is not None:
+                            trail.append((masks, n, masks[n]))
+                        removed = masks[n] ^ new_mask
+                        self._resize(n, masks[n], new_mask)
+                        masks[n] = new_mask
+                        pruned['inequality'] += removed.bit_count()
+                        if expl is not None:
+                            self._explain(n, expl[idx])
+                        if not new_mask:
+                            return self._fail(n, topology.edge_constraint(idx, n))
+                        if dual and not self._channel(n, removed):
+                            return False
+                        changed.append(n)
+
+            # 3. Atualiza os limites ao longo das cadeias de desigualdade a partir dos vizinhos alterados
+            if changed and not self._propagate_mac(changed, alldiff=False):
+                return False
+
+            # 4. Hidden singles encontrados pelo modelo dual
+            if dual and self.forced:
+                return self._propagate_forced()
 
             return True  # Estado consistente após propagação
 
-        def choose_next_variable(self):
-            """Escolhe próxima variável usando MRV + Degree"""
-            min_domain_size = float('inf')
-            candidates = []
+        def _propagate_mac(self, changed, alldiff=True):
+            """
+            Mantém consistência de arco (MAC) em todos os arcos de unicidade e de desigualdade,
+            partindo das células em 'changed' (cujos domínios acabaram de mudar).
+            Usa uma worklist (deque) sem repetições: cada célula reduzida entra uma única vez
+            na fila até ser processada. Com alldiff=False só os limites (mínimo/máximo) são
+            propagados ao longo das cadeias de desigualdade (os hidden singles ficam em
+            self.forced para o chamador).
+            Retorna False se algum domínio ficou vazio.
+            """
+            topology = self.topology
+            peers = topology.peers
+            ineq = topology.ineq
+            less_than = topology.less_than
+            greater_than = topology.greater_than
+            masks = self.masks
+            trail = self.trail
+            dual = self.places is not None
+            forced = self.forced
+            expl = self.expl
+            resize = self._resize
+            matching = alldiff and self.alldiff == 'matching'
+            cell_units = topology.cell_units
+            dirty_units = set()  # Unidades com domínios alterados, a filtrar pelo emparelhamento
+            pruned = self.stats.pruned
+
+            queue = deque(changed)
+            in_queue = [False] * len(masks)
+            for idx in queue:
+                in_queue[idx] = True
+
+            while True:
+                # 0. Hidden singles: a célula é a única posição do valor na unidade
+                if alldiff and forced:
+                    while forced:
+                        q, bit, u = forced.pop()
+                        mq = masks[q]
+                        if mq != bit:
+                            if expl is not None:
+                                self._explain(q, self._unit_reason(u))
+                            if not mq & bit:
+                                return self._fail(q, u)
+                            if trail is not None:
+                                trail.append((masks, q, mq))
+                            masks[q] = bit
+                            resize(q, mq, bit)
+                            pruned['hidden_single'] += (mq ^ bit).bit_count()
+                            if not self._channel(q, mq ^ bit):
+                                return False
+                            if not in_queue[q]:
+                                in_queue[q] = True
+                                queue.append(q)
+                if not queue:
+                    if not dirty_units:
+                        break
+                    # Filtro global de unicidade, só quando os arcos binários já estão consistentes
+                    if not self._filter_alldiff(dirty_units.pop(), queue, in_queue):
+                        return False
+                    continue
+
+                x = queue.popleft()
+                in_queue[x] = False
+                mx = masks[x]
+                if matching:
+                    dirty_units.update(cell_units[x])
 
-            for r in range(self.size):
-                for c in range(self.size):
-                    if self.puzzle[r][c] == 0:  # Apenas células não atribuídas
-                        domain_size = len(self.domains[r][c])
-                        if domain_size == 0:  # Inconsistência encontrada
-                            self.target = (-1, -1)  # Sinaliza erro/beco sem saída
-                            return
-                        if domain_size < min_domain_size:
-                            min_domain_size = domain_size
-                            candidates = [(r, c)]
-                        elif domain_size == min_domain_size:
-                            candidates.append((r, c))
-
-            if not candidates:  # Não há mais células vazias
+                # 1. Arcos de unicidade: só podam quando o domínio de x é unitário
+                if alldiff and not mx & (mx - 1):
+                    for p in peers[x]:
+                        mp = masks[p]
+                        if mp & mx:
+                            if trail is not None:
+                                trail.append((masks, p, mp))
+                            mp ^= mx
+                            masks[p] = mp
+                            resize(p, mp | mx, mp)
+                            pruned['alldiff'] += 1
+                            if expl is not None:
+                                self._explain(p, expl[x])
+                            if not mp:
+                                return self._fail(p, topology.shared_unit(x, p))  # Domínio vazio -> Inconsistência
+                            if dual and not self._channel(p, mx):
+                                return False
+                            if not in_queue[p]:
+                                in_queue[p] = True
+                                queue.append(p)
+
+                # 2. Arcos de desigualdade: vizinho < max(x) ou vizinho > min(x)
+                if ineq[x]:
+                    below_max = less_than[mx.bit_length() - 1]
+                    above_min = greater_than[(mx & -mx).bit_length() - 1]
+                    for n, greater in ineq[x]:
+                        mn = masks[n]
+                        new_mask = mn & (below_max if greater else above_min)
+                        if new_mask != mn:
+                            if trail is not None:
+                                trail.append((masks, n, mn))
+                            masks[n] = new_mask
+                            resize(n, mn, new_mask)
+                            pruned['inequality'] += (mn ^ new_mask).bit_count()
+                            if expl is not None:
+                                self._explain(n, expl[x])
+                            if not new_mask:
+                                return self._fail(n, topology.edge_constraint(x, n))
+                            if dual and not self._channel(n, mn ^ new_mask):
+                                return False
+                            if not in_queue[n]:
+                                in_queue[n] = True
+                                queue.append(n)
+
+            return True
+
+        def _filter_alldiff(self, u, queue, in_queue):
+            """
+            Filtro de unicidade global (Régin) para a unidade u: calcula um emparelhamento
+            máximo célula -> valor (partindo do anterior) e remove todo valor que não aparece
+            em nenhum emparelhamento completo, ou seja, cujo arco não está em um ciclo alternante
+            (mesma componente fortemente conexa) nem leva a um valor livre.
+            Células reduzidas são colocadas na fila do MAC. Retorna False se não há emparelhamento.
+            """
+            unit = self.topology.units[u]
+            masks = self.masks
+            n = len(unit)
+            if self.matchings is None:
+                self.matchings = [[0] * len(unit_cells) for unit_cells in self.topology.units]
+            match = self.matchings[u]  # match[p] = valor casado com a posição p
+            owner = [-1] * (self.size + 1)  # owner[v] = posição casada com o valor v
+
+            # 1. Reaproveita as arestas do emparelhamento anterior que continuam válidas
+            for p in range(n):
+                v = match[p]
+                if v and masks[unit[p]] >> v & 1 and owner[v] < 0:
+                    owner[v] = p
+                else:
+                    match[p] = 0
+
+            # 2. Completa o emparelhamento com caminhos aumentantes (Kuhn)
+            def augment(p, seen):
+                m = masks[unit[p]]
+                while m:
+                    low = m & -m
+                    m ^= low
+                    v = low.bit_length() - 1
+                    if seen[v]:
+                        continue
+                    seen[v] = True
+                    if owner[v] < 0 or augment(owner[v], seen):
+                        owner[v] = p
+                        match[p] = v
+                        return True
+                return False
+
+            for p in range(n):
+                if not match[p] and not augment(p, [False] * (self.size + 1)):
+                    if self.expl is not None:
+                        self.conflict = self._unit_reason(u)
+                    self._bump_weight(u)
+                    return False  # k células disputando menos de k valores
+
+            # 3. Grafo residual contraído nas células: p -> q se p pode tomar o valor casado com q.
+            #    Fecho transitivo com bitsets (Warshall); free = células com algum valor livre.
+            reach = [0] * n
+            free = 0
+            for p in range(n):
+                m = masks[unit[p]] & ~(1 << match[p])
+                while m:
+                    low = m & -m
+                    m ^= low
+                    q = owner[low.bit_length() - 1]
+                    if q < 0:
+                        free |= 1 << p
+                    else:
+                        reach[p] |= 1 << q
+            for k in range(n):
+                bk = 1 << k
+                rk = reach[k]
+                for p in range(n):
+                    if reach[p] & bk:
+                        reach[p] |= rk
+            to_free = [bool(free >> q & 1 or reach[q] & free) for q in range(n)]
+
+            # 4. Remove os valores cujo arco não pertence a nenhum emparelhamento máximo
+            trail = self.trail
+            reason = self._unit_reason(u) if self.expl is not None else 0
+            for p in range(n):
+                idx = unit[p]
+                mp = masks[idx]
+                m = mp & ~(1 << match[p])
+                removed = 0
+                while m:
+                    low = m & -m
+                    m ^= low
+                    q = owner[low.bit_length() - 1]
+                    if q >= 0 and not to_free[q] and not (reach[p] >> q & 1 and reach[q] >> p & 1):
+                        removed |= low
+                if removed:
+                    if trail is not None:
+                        trail.append((masks, idx, mp))
+                    masks[idx] = mp ^ removed
+                    self._resize(idx, mp, mp ^ removed)
+                    self.stats.pruned['matching'] += removed.bit_count()
+                    if reason:
+                        self._explain(idx, reason)
+                    if self.places is not None and not self._channel(idx, removed):
+                        return False
+                    if not in_queue[idx]:
+                        in_queue[idx] = True
+                        queue.append(idx)
+            return True
+
+        def choose_next_variable(self):
+            """Escolhe próxima variável usando MRV + Degree (ou dom/wdeg, se há pesos)"""
+            if self.weights is not None:
+                self._choose_dom_wdeg()
+                return
+            if not self.open_count[0]:  # Não há mais células vazias
                 self.target = None  # Sinaliza que o puzzle está completo
                 return
+            buckets = self.buckets
+            if buckets[0]:  # Inconsistência: célula não atribuída com domínio vazio
+                self.target = (-1, -1)  # Sinaliza erro/beco sem saída
+                return
+
+            bucket = buckets[1]
+            if bucket:
+                # Domínio unitário: não há ramificação, então o desempate não importa
+                self.target = self.topology.cells[(bucket & -bucket).bit_length() - 1]
+                return
+
+            # Menor bucket não vazio: as células de domínio mínimo (em ordem de índice)
+            bucket = next(b for b in buckets if b)
+            candidates = []
+            while bucket:
+                low = bucket & -bucket
+                bucket ^= low
+                candidates.append(low.bit_length() - 1)
 
             # Degree Heuristic (desempate) - Conta vizinhos *não atribuídos* afetados
             if len(candidates) > 1:
+                # Os buckets guardam exatamente as células não atribuídas
+                open_cells = 0
+                for b in buckets:
+                    open_cells |= b
+                peer_masks = self.topology.peer_masks
                 max_degree = -1
-                best_candidate = candidates[0]
-                for r, c in candidates:
+                best = []
+                for idx in candidates:
                     # Grau = número de vizinhos não atribuídos no grafo de restrições
-                    degree = sum(1 for ar, ac in self._affected_cells_cache[(r, c)]
-                                 if self.puzzle[ar][ac] == 0)
+                    degree = (peer_masks[idx] & open_cells).bit_count()
                     if degree > max_degree:
                         max_degree = degree
-                        best_candidate = (r, c)
-                self.target = best_candidate
+                        best = [idx]
+                    elif degree == max_degree:
+                        best.append(idx)
+                # Empate também no grau: o primeiro ou, com rng, um sorteado
+                best_candidate = best[0] if self.rng is None else self.rng.choice(best)
+                self.target = self.topology.cells[best_candidate]
             else:
-                self.target = candidates[0]  # Único candidato MRV
+                self.target = self.topology.cells[candidates[0]]  # Único candidato MRV
+
+        def _choose_dom_wdeg(self):
+            """
+            Heurística dom/wdeg: escolhe a célula com o menor tamanho de domínio dividido pelo
+            grau ponderado, a soma dos pesos das restrições (unidades e desigualdades) que
+            ainda envolvem outra célula não atribuída.
+            """
+            topology = self.topology
+            masks = self.masks
+            weights = self.weights
+            flat = [v for row in self.puzzle for v in row]
+            unit_open = [sum(1 for idx in unit if not flat[idx]) for unit in topology.units]
+
+            best_score = None
+            best = []
+            for idx in range(len(flat)):
+                if flat[idx]:
+                    continue
+                domain_size = masks[idx].bit_count()
+                if domain_size == 0:
+                    self.target = (-1, -1)  # Sinaliza erro/beco sem saída
+                    return
+                wdeg = 0
+                for u in topology.cell_units[idx]:
+                    if unit_open[u] > 1:
+                        wdeg += weights[u]
+                for (n, _), constraint in zip(topology.ineq[idx], topology.ineq_ids[idx]):
+                    if not flat[n]:
+                        wdeg += weights[constraint]
+                score = domain_size / wdeg if wdeg else math.inf
+                if best_score is None or score < best_score:
+                    best_score = score
+                    best = [idx]
+                elif score == best_score:
+                    best.append(idx)
+
+            if not best:  # Não há mais células vazias
+                self.target = None
+                return
+            best_candidate = best[0] if self.rng is None else self.rng.choice(best)
+            self.target = topology.cells[best_candidate]
 
         def get_ordered_values(self):
-            """Ordena valores do domínio do target usando LCV"""
+            """
+            Ordena os valores do domínio do target: LCV (menos restritivo primeiro) ou crescente.
+            Domínios unitários não são ordenados.
+            """
             if self.target is None or self.target == (-1, -1):
                 self.target_vals = []
                 return
 
             r, c = self.target
-            values = list(self.domains[r][c])
-
-            # LCV - Conta quantos valores seriam removidos dos domínios dos vizinhos
-            def count_conflicts(val_to_try):
-                conflicts = 0
-                # Simula o impacto nos vizinhos (sem deepcopy, apenas contando)
-                for ar, ac in self._affected_cells_cache[(r, c)]:
-                    if self.puzzle[ar][ac] == 0:  # Se vizinho não atribuído
-                        # Verifica unicidade linha/coluna/quadrante
-                        in_same_row = (r == ar)
-                        in_same_col = (c == ac)
-                        in_same_quad = (r // self.quad_size == ar // self.quad_size) and \
-                                      (c // self.quad_size == ac // self.quad_size)
-                        if (in_same_row or in_same_col or in_same_quad) and val_to_try in self.domains[ar][ac]:
-                            conflicts += 1  # Contaria como 1 remoção potencial
-
-                        # Verifica desigualdades
-                        # Horizontal
-                        elif c + 1 == ac and (r, c) in self.h_const and val_to_try in self.domains[ar][ac]: 
-                            conflicts += 1
-                        elif c - 1 == ac and (ar, ac) in self.h_const and val_to_try in self.domains[ar][ac]: 
-                            conflicts += 1
-                        # Vertical
-                        elif r + 1 == ar and (r, c) in self.v_const and val_to_try in self.domains[ar][ac]: 
-                            conflicts += 1
-                        elif r - 1 == ar and (ar, ac) in self.v_const and val_to_try in self.domains[ar][ac]: 
-                            conflicts += 1
-
-                return conflicts
-
-            # Ordena: menos conflitos primeiro
-            self.target_vals = sorted(values, key=count_conflicts)
+            idx = r * self.size + c
+            mask = self.masks[idx]
+            values = mask_values(mask)
             self.target_index = 0
+            if len(values) < 2 or self.value_order == 'ascending':
+                self.target_vals = values
+                return
+
+            scores = self._value_scores(idx, mask)
+            # Ordena: menos conflitos primeiro (com rng, empates em ordem aleatória)
+            if self.rng is not None:
+                self.rng.shuffle(values)
+            self.target_vals = sorted(values, key=scores.__getitem__)
+
+        def _value_scores(self, idx, mask):
+            """
+            Pontuação LCV de todos os valores de uma vez: scores[v] ~ quantos vizinhos ainda
+            aceitam v (perderiam o valor se ele fosse atribuído a idx). Com o modelo dual é a
+            soma, nas unidades da célula, do número de posições que aceitam v; sem ele, uma
+            única passada pelos vizinhos conta os bits em comum com o domínio de idx.
+            """
+            size = self.size
+            scores = [0] * (size + 1)
+            places = self.places
+            if places is not None:
+                stride = size + 1
+                for u in self.topology.cell_units[idx]:
+                    base = u * stride
+                    m = mask
+                    while m:
+                        low = m & -m
+                        m ^= low
+                        v = low.bit_length() - 1
+                        scores[v] += places[base + v].bit_count()
+                return scores
+
+            # Vizinhos já atribuídos não têm valores em comum com o domínio (foram podados)
+            masks = self.masks
+            for p in self.topology.peers[idx]:
+                m = masks[p] & mask
+                while m:
+                    low = m & -m
+                    m ^= low
+                    scores[low.bit_length() - 1] += 1
+            return scores
+
+        def assign(self, r, c, value):
+            """
+            Atribui 'value' a (r, c) no próprio estado (registrando no trail) e propaga.
+            Retorna True se consistente, False se algum domínio ficou vazio.
+            """
+            idx = r * self.size + c
+            old_mask = self.masks[idx]
+            if self.trail is not None:
+                self.trail.append((self.puzzle[r], c, self.puzzle[r][c]))
+                self.trail.append((self.masks, idx, old_mask))
+            self.puzzle[r][c] = value
+            self.masks[idx] = 1 << value  # Fixa o domínio
+            # Sai dos buckets do MRV e do contador de células abertas
+            buckets = self.buckets
+            k = old_mask.bit_count()
+            if buckets[k] >> idx & 1:
+                if self.trail is not None:
+                    self.trail.append((buckets, k, buckets[k]))
+                    self.trail.append((self.open_count, 0, self.open_count[0]))
+                buckets[k] ^= 1 << idx
+                self.open_count[0] -= 1
+            if self.expl is not None:
+                # O domínio passa a depender só desta decisão (nível 0 não é decisão)
+                if self.trail is not None:
+                    self.trail.append((self.expl, idx, self.expl[idx]))
+                self.expl[idx] = 1 << self.level if self.level else 0
+                self.conflict = 0
+            self.stats.propagations += 1
+            if self.places is not None:
+                self.forced.clear()  # Pendências de uma tentativa anterior que falhou
+                if not self._channel(idx, old_mask & ~(1 << value)):
+                    return False
+            return self._propagate_constraints(r, c, value)
+
+        def undo(self, mark):
+            """Desfaz as alterações registradas no trail até o tamanho 'mark'"""
+            trail = self.trail
+            while len(trail) > mark:
+                array, i, old = trail.pop()
+                array[i] = old
 
         def is_complete(self):
-            """Verifica se o puzzle está completo (sem zeros)"""
-            return all(self.puzzle[r][c] != 0 for r in range(self.size) for c in range(self.size))
+            """Verifica se o puzzle está completo (sem zeros), pelo contador de células abertas"""
+            return not self.open_count[0]
 
     # --- Fim da classe Board ---
 
-    def __init__(self, initial_puzzle_list, h_const, v_const):
-        """Inicializa o resolvedor com o puzzle e restrições"""
+    def __init__(self, initial_puzzle_list, h_const, v_const, mode='trail', propagation='mac',
+                 hidden_singles=True, alldiff='pairwise', quad_size=None, max_node_visits=2000000,
+                 verbose=True, node_callback=None, backjump=False, restarts=None, restart_base=100,
+                 keep_learned=True, seed=None, time_limit=None, var_order='mrv', value_order='lcv'):
+        """
+        Inicializa o resolvedor com o puzzle e restrições.
+        mode: 'trail' (estado único, alterações desfeitas pelo trail) ou
+              'copy' (um Board copiado por nó da árvore de busca)
+        propagation: 'mac' (consistência de arco completa após cada decisão) ou
+                     'fc' (forward checking a partir da célula atribuída)
+        hidden_singles: mantém o modelo dual valor -> posições de cada unidade e
+                        atribui um valor assim que ele só cabe em uma célula da unidade
+        alldiff: 'pairwise' (remove o valor atribuído dos vizinhos) ou 'matching'
+                 (filtro global por emparelhamento em cada unidade; requer propagation='mac')
+        quad_size: tamanho do quadrante (padrão: deduzido do tamanho do puzzle, 0 = sem quadrantes)
+        max_node_visits: limite de visitas antes de desistir (status 'limit')
+        verbose: imprime progresso e resumo no stdout
+        node_callback: (modo trail) função chamada com o resolvedor a cada CALLBACK_INTERVAL
+                       visitas; se retornar True a busca é interrompida (status 'stopped')
+        backjump: (modo trail) backjumping dirigido por conflitos: cada poda guarda os níveis de
+                  decisão que a causaram; ao esgotar um nó a busca volta direto ao nível mais
+                  profundo responsável e registra o conflito como nogood se ele for pequeno
+        restarts: (modo trail, só solve) None, 'luby' ou 'geometric': a busca recomeça da raiz
+                  quando a execução esgota seu orçamento de visitas (restart_base vezes o termo
+                  da sequência de Luby, ou restart_base * 1.5^k), com desempates aleatórios
+        keep_learned: mantém os nogoods do backjumping entre os reinícios
+        seed: semente do gerador dos desempates (MRV/grau e LCV); ativa os desempates
+              aleatórios mesmo sem reinícios
+        time_limit: limite de tempo em segundos para a busca inteira (status 'limit')
+        var_order: 'mrv' (menor domínio, desempate pelo grau) ou 'dom/wdeg' (domínio dividido
+                   pela soma dos pesos das restrições; cada domínio esvaziado aumenta o peso da
+                   restrição responsável, e os pesos valem para a busca inteira)
+        value_order: 'lcv' (valor menos restritivo primeiro) ou 'ascending' (ordem crescente).
+                     Na enumeração exaustiva (iter_solutions/count_solutions sem limite) a
+                     ordem não importa e os valores não são ordenados.
+        """
+        if mode not in ('trail', 'copy'):
+            raise ValueError(f"Modo de busca desconhecido: {mode}")
+        if propagation not in ('mac', 'fc'):
+            raise ValueError(f"Propagação desconhecida: {propagation}")
+        if alldiff not in ('pairwise', 'matching'):
+            raise ValueError(f"Filtro de unicidade desconhecido: {alldiff}")
+        if alldiff == 'matching' and propagation != 'mac':
+            raise ValueError("alldiff='matching' requer propagation='mac'")
+        if backjump and mode != 'trail':
+            raise ValueError("backjump requer mode='trail'")
+        if value_order not in ('lcv', 'ascending'):
+            raise ValueError(f"Ordem de valores desconhecida: {value_order}")
+        if var_order not in ('mrv', 'dom/wdeg'):
+            raise ValueError(f"Heurística de escolha de variável desconhecida: {var_order}")
+        if restarts not in (None, 'luby', 'geometric'):
+            raise ValueError(f"Estratégia de reinício desconhecida: {restarts}")
+        if (restarts or seed is not None) and mode != 'trail':
+            raise ValueError("restarts/seed requerem mode='trail'")
+        size = len(initial_puzzle_list)
+        if quad_size and (quad_size < 0 or size % quad_size):
+            raise ValueError(f"Quadrante {quad_size} não divide o tabuleiro {size}x{size}.")
+        self.mode = mode
+        self.propagation = propagation
+        self.hidden_singles = hidden_singles
+        self.alldiff = alldiff
+        self.max_node_visits = max_node_visits
+        self.verbose = verbose
+        self.node_callback = node_callback
+        self.backjump = backjump
+        self.restarts = restarts
+        self.restart_base = restart_base
+        self.keep_learned = keep_learned
+        self.seed = seed
+        self.time_limit = time_limit
+        self.var_order = var_order
+        self.value_order = value_order
+        self.restart_count = 0  # Reinícios na última busca
+        self._run_limit = None  # Visitas em que a execução corrente deve reiniciar
+        self._deadline = None  # time.time() limite da busca corrente
+        self.nogoods = {}  # (Backjumping) (célula, valor) -> nogoods que contêm esse literal
+        self.nogood_count = 0
+        self.backjumps = 0  # Níveis pulados pelo backjumping na última busca
+        self.node_visits = 0  # Visitas da última chamada de solve()
+        self.stats = SolverStats()  # Estatísticas da última busca (ver SolverStats)
+        self.status = None  # Resultado da última busca: 'solved', 'unsat', 'limit' ou 'stopped'
+        self.frames = []  # (modo trail) Pilha de nós da busca em andamento
+        # Cópia intocada do puzzle: cada busca recomeça dela (o modo trail modifica o estado in-place)
+        self.initial_puzzle = [list(row) for row in initial_puzzle_list]
+        if mode == 'trail':
+            initial_puzzle_list = [list(row) for row in initial_puzzle_list]
         # Cria o estado inicial (raiz da árvore de busca)
-        self.root = self.Board(initial_puzzle_list, h_const, v_const)
+        self.root = self.Board(initial_puzzle_list, h_const, v_const, propagation=propagation,
+                               hidden_singles=hidden_singles, alldiff=alldiff, quad_size=quad_size,
+                               value_order=value_order)
+
+    def _log(self, message):
+        """Mensagem de progresso (só no modo verbose)"""
+        if self.verbose:
+            print(message)
+
+    CALLBACK_INTERVAL = 1024  # Visitas entre chamadas de node_callback
+    MAX_NOGOOD_SIZE = 3  # Só conflitos com até este número de decisões viram nogoods
+    MAX_NOGOODS = 100000  # Limita a memória dos nogoods registrados
+    GEOMETRIC_FACTOR = 1.5  # Crescimento do orçamento de visitas nos reinícios geométricos
+    TIME_CHECK_INTERVAL = 256  # Visitas entre consultas ao relógio (time_limit)
 
-    def solve(self):
-        """Executa o algoritmo de backtracking com propagação de restrições"""
-        
-        # Inicializa domínios e aplica consistência inicial
+    def prepare(self, assumptions=()):
+        """
+        Inicializa os domínios da raiz, aplica a consistência inicial e impõe as
+        atribuições (r, c, valor) de 'assumptions'. Retorna False se o estado é inconsistente.
+        """
+        start = time.perf_counter()
+        try:
+            return self._prepare(assumptions)
+        finally:
+            self.stats.time_propagation += time.perf_counter() - start
+
+    def _prepare(self, assumptions):
+        """Corpo de prepare; o tempo gasto conta como propagação em self.stats"""
+        self.root.puzzle = [list(row) for row in self.initial_puzzle]
+        self.root.trail = None
+        self.root.forced = []
+        self.root.level = 0
+        self.root.expl = [0] * (self.root.size * self.root.size) if self.backjump else None
         if not self.root.initialize_domains():
-            print("Erro na inicialização dos domínios.")
-            return None
+            self._log("Puzzle inicial inconsistente (domínio vazio na inicialização).")
+            return False
         if not self.root.apply_initial_consistency():
-            print("Puzzle inicial inconsistente.")
-            return None
+            self._log("Puzzle inicial inconsistente.")
+            return False
+        for r, c, value in assumptions:
+            if not self.root.masks[r * self.root.size + c] >> value & 1 or not self.root.assign(r, c, value):
+                self._log("Subproblema inconsistente.")
+                return False
+        return True
+
+    def _start(self, exhaustive=False):
+        """
+        Zera contadores e o que foi aprendido antes de uma nova busca.
+        exhaustive: a busca vai percorrer a árvore inteira (a ordem dos valores não importa)
+        """
+        self.root.value_order = 'ascending' if exhaustive else self.value_order
+        self.node_visits = 0
+        self.status = 'unsat'
+        # Os nogoods valem só sob as suposições com que foram aprendidos (que ficam no nível 0)
+        self.nogoods = {}
+        self.nogood_count = 0
+        self.backjumps = 0
+        self.restart_count = 0
+        self.stats = self.root.stats = SolverStats()
+        self._started = time.perf_counter()
+        self._run_limit = None
+        self._deadline = time.time() + self.time_limit if self.time_limit is not None else None
+        if self.restarts or self.seed is not None:
+            self.root.rng = random.Random(self.seed)
+        else:
+            self.root.rng = None
+        # Pesos do dom/wdeg: começam em 1 e acumulam durante toda a busca (inclusive reinícios)
+        self.root.weights = [1] * self.root.topology.n_constraints if self.var_order == 'dom/wdeg' else None
+
+    def _finish_stats(self):
+        """Completa self.stats com os contadores do BackTracker ao fim de uma busca"""
+        stats = self.stats
+        stats.status = self.status
+        stats.nodes = self.node_visits
+        stats.backjumps = self.backjumps
+        stats.restarts = self.restart_count
+        stats.nogoods = self.nogood_count
+        stats.time_total = time.perf_counter() - self._started
+        return stats
+
+    def _restart_budget(self, run):
+        """Orçamento de visitas da execução 'run' (a partir de 1) no esquema de reinícios"""
+        if self.restarts == 'luby':
+            return luby(run) * self.restart_base
+        return int(self.restart_base * self.GEOMETRIC_FACTOR ** (run - 1))
+
+    def solve(self, assumptions=()):
+        """
+        Executa o algoritmo de backtracking com propagação de restrições.
+        assumptions: atribuições (r, c, valor) impostas antes da busca (subproblema).
+        Retorna a solução (lista de listas) ou None; o motivo fica em self.status.
+        """
+        self._start()
+        try:
+            if not self.prepare(assumptions):
+                return None
+            if self.mode == 'trail':
+                return self._solve_trail(assumptions)
+            return self._solve_copy()
+        finally:
+            self._finish_stats()
+
+    def count_solutions(self, limit=2):
+        """
+        Conta as soluções continuando a mesma busca (com propagação) depois de cada solução,
+        parando assim que 'limit' soluções forem encontradas (limit=None: enumera todas).
+        Retorna SolutionCount(count, exact): exact=False se a busca parou no limite de
+        soluções ou de visitas, ou seja, pode haver mais soluções do que count.
+        """
+        if self.mode != 'trail':
+            raise ValueError("count_solutions requer mode='trail'")
+        self._start(exhaustive=limit is None)
+        try:
+            if not self.prepare():
+                return SolutionCount(0, True)
+            count = 0
+            for _ in self._search():
+                count += 1
+                if limit is not None and count >= limit:
+                    return SolutionCount(count, False)
+            return SolutionCount(count, self.status != 'limit')
+        finally:
+            self._finish_stats()
+
+    def iter_solutions(self, max_solutions=None):
+        """
+        Gera as soluções uma a uma a partir de uma única busca (cada uma é uma cópia do
+        puzzle). Nada é acumulado: a memória não depende do número de soluções e o
+        consumidor pode parar a iteração quando quiser. max_solutions limita o total gerado.
+        Ao final, self.status é 'solved', 'unsat', 'limit' ou 'stopped' como em solve().
+        """
+        if self.mode != 'trail':
+            raise ValueError("iter_solutions requer mode='trail'")
+        self._start(exhaustive=max_solutions is None)
+        if max_solutions is not None and max_solutions <= 0:
+            return
+        try:
+            if not self.prepare():
+                return
+            count = 0
+            for solution in self._search():
+                yield [list(row) for row in solution]
+                count += 1
+                if max_solutions is not None and count >= max_solutions:
+                    return
+        finally:
+            self._finish_stats()
 
+    def has_unique_solution(self):
+        """Verifica se o puzzle tem exatamente uma solução (para a busca na segunda)"""
+        result = self.count_solutions(limit=2)
+        return result.count == 1 and result.exact
+
+    def _solve_trail(self, assumptions=()):
+        """
+        Primeira solução da busca com trail (ver _search). Com reinícios, cada execução tem
+        um orçamento de visitas; ao esgotá-lo a busca recomeça da raiz (os desempates
+        aleatórios levam a outra árvore), mantendo os nogoods se keep_learned.
+        """
+        start_time = time.time()
+        run = 1
+        while True:
+            if self.restarts:
+                self._run_limit = self.node_visits + self._restart_budget(run)
+            for solution in self._search():
+                elapsed = time.time() - start_time
+                self._log(f"\nSolução encontrada! Visitas: {self.node_visits} (Tempo: {elapsed:.2f}s)")
+                return [list(row) for row in solution]  # Cópia: o estado continua sendo da busca
+            if self.status != 'restart':
+                break
+            run += 1
+            self.restart_count += 1
+            self.status = 'unsat'
+            if not self.keep_learned:
+                self.nogoods = {}
+                self.nogood_count = 0
+            if not self.prepare(assumptions):
+                return None
+        if self.status != 'limit':
+            elapsed = time.time() - start_time
+            self._log(f"\nBacktrack até a raiz sem solução. Visitas: {self.node_visits} (Tempo: {elapsed:.2f}s)")
+        return None
+
+    def _search(self):
+        """
+        Busca sobre um único Board: cada descida registra as alterações de domínio
+        no trail e o backtrack restaura o estado voltando o trail até a marca do nó.
+        Gerador: produz o puzzle (o próprio estado da busca, não uma cópia) a cada solução
+        e, se retomado, continua procurando a próxima. Ao terminar, self.status indica
+        'solved' (houve solução), 'unsat', 'limit' ou 'stopped'.
+        """
+        board = self.root
+        board.trail = []
+        # Pilha de nós: [alvo (r, c), valores ordenados, índice do valor, marca do trail, conflito].
+        # Em todos os nós abaixo do topo, target_vals[índice] é o valor atribuído no caminho atual.
+        # O nó frames[i] está no nível de decisão i + 1; 'conflito' (backjumping) é o bitset dos
+        # níveis anteriores responsáveis pelas falhas dos valores já tentados.
+        frames = self.frames = []
+        frame = None  # Nó corrente (None = estado recém-propagado, ainda sem variável escolhida)
+        node_visits = self.node_visits  # Acumula entre as execuções de uma busca com reinícios
+        max_node_visits = self.max_node_visits  # Limite para evitar loops infinitos
+        run_limit = self._run_limit
+        deadline = self._deadline
+        node_callback = self.node_callback
+        backjump = self.backjump
+        nogoods = self.nogoods
+        stats = self.stats
+        clock = time.perf_counter
+        start_time = time.time()
+
+        while True:
+            node_visits += 1
+            self.node_visits = node_visits
+            if node_visits > max_node_visits:
+                self.status = 'limit'
+                self._log(f"Limite de {max_node_visits} visitas atingido.")
+                return
+            if node_callback is not None and node_visits % self.CALLBACK_INTERVAL == 0 and node_callback(self):
+                self.status = 'stopped'
+                return
+            if deadline is not None and node_visits % self.TIME_CHECK_INTERVAL == 0 and time.time() > deadline:
+                self.status = 'limit'
+                self._log(f"Limite de tempo de {self.time_limit}s atingido.")
+                return
+            if run_limit is not None and node_visits > run_limit:
+                self.status = 'restart'  # Orçamento da execução esgotado (ver _solve_trail)
+                return
+
+            # Feedback de progresso
+            if node_visits % 50000 == 0:
+                elapsed = time.time() - start_time
+                self._log(f"Visitas: {node_visits}... (Tempo: {elapsed:.2f}s)")
+
+            if frame is None:
+                # 1. Verifica se o estado atual é uma solução completa
+                if board.is_complete():
+                    self.status = 'solved'
+                    stats.solutions += 1
+                    yield board.puzzle
+                    # Retomado: trata a solução como beco sem saída e segue para o próximo valor.
+                    # Os nós do caminho não podem ser pulados: o conflito inclui todos os níveis acima.
+                    if not frames:
+                        return
+                    for i, f in enumerate(frames):
+                        f[4] |= (1 << (i + 1)) - 2
+                    frame = frames[-1]
+                    frame[2] += 1
+                    continue
+
+                # 2. Escolhe a próxima variável (célula) e ordena seus valores
+                t0 = clock()
+                board.choose_next_variable()
+                t1 = clock()
+                board.get_ordered_values()
+                stats.time_value_ordering += clock() - t1
+                stats.time_variable_selection += t1 - t0
+                level = len(frames) + 1
+                if board.target != (-1, -1):
+                    target_vals = board.target_vals
+                    # Valores já podados do domínio contam como falhas com a explicação da célula
+                    conflict = board.expl[board.target[0] * board.size + board.target[1]] if backjump else 0
+                else:
+                    target_vals = []
+                    conflict = (1 << level) - 2  # Sem explicação: volta cronologicamente
+                frame = [board.target, target_vals, 0, len(board.trail), conflict]
+                frames.append(frame)
+                if level > stats.max_depth:
+                    stats.max_depth = level
+
+            target, target_vals, index, mark, conflict = frame
+            if index < len(target_vals):
+                # --- Tentativa (Descer na árvore) ---
+                board.undo(mark)  # Descarta os efeitos da tentativa anterior neste nó
+                target_r, target_c = target
+                value = target_vals[index]
+                level = len(frames)
+                if nogoods:
+                    reason = self._nogood_reason(target_r * board.size + target_c, value)
+                    if reason is not None:
+                        stats.pruned['nogood'] += 1
+                        frame[4] |= reason
+                        frame[2] += 1
+                        continue
+                board.level = level
+                stats.decisions += 1
+                t0 = clock()
+                consistent = board.assign(target_r, target_c, value)
+                stats.time_propagation += clock() - t0
+                if consistent:
+                    frame = None  # Avança para o estado filho
+                else:
+                    stats.failures += 1
+                    frame[4] |= board.conflict & ~(1 << level)
+                    frame[2] += 1  # Inconsistência: tenta o próximo valor no nó atual
+            else:
+                # --- Backtrack (Subir na árvore) ---
+                board.undo(mark)
+                if backjump:
+                    self._record_nogood(conflict)
+                frames.pop()
+                stats.backtracks += 1
+                if not frames:
+                    return  # Chegou de volta à raiz e não há mais opções
+                if backjump:
+                    if not conflict:
+                        return  # A falha não depende de nenhuma decisão: não há solução
+                    # Volta direto ao nível mais profundo responsável pelo conflito
+                    jump_level = conflict.bit_length() - 1
+                    self.backjumps += len(frames) - jump_level
+                    del frames[jump_level:]
+                    frames[-1][4] |= conflict & ~(1 << jump_level)
+                frame = frames[-1]
+                frame[2] += 1  # Prepara para tentar o próximo valor do pai
+
+    def _nogood_reason(self, idx, value):
+        """
+        (Backjumping) Se atribuir 'value' a idx completaria um nogood registrado (todos os
+        outros literais já valem no estado atual), retorna os níveis que explicam esses
+        literais; senão None.
+        """
+        masks = self.root.masks
+        expl = self.root.expl
+        for nogood in self.nogoods.get((idx, value), ()):
+            reason = 0
+            for i, v in nogood:
+                if i != idx:
+                    if masks[i] != 1 << v:
+                        break
+                    reason |= expl[i]
+            else:
+                return reason
+        return None
+
+    def _record_nogood(self, conflict):
+        """
+        (Backjumping) Registra as decisões dos níveis em 'conflict' (que juntas não têm
+        solução) como nogood, indexado por cada um dos seus literais (célula, valor).
+        """
+        if not conflict or conflict.bit_count() > self.MAX_NOGOOD_SIZE or self.nogood_count >= self.MAX_NOGOODS:
+            return
+        size = self.root.size
+        nogood = []
+        levels = conflict
+        while levels:
+            low = levels & -levels
+            levels ^= low
+            (r, c), vals, index = self.frames[low.bit_length() - 2][:3]
+            nogood.append((r * size + c, vals[index]))
+        nogood = tuple(nogood)
+        for literal in nogood:
+            self.nogoods.setdefault(literal, []).append(nogood)
+        self.nogood_count += 1
+
+    def _solve_copy(self):
+        """Busca criando um Board filho (cópia do puzzle e dos domínios) a cada descida"""
         curr = self.root  # Começa na raiz
         node_visits = 0
-        max_node_visits = 2000000  # Limite para evitar loops infinitos
+        max_node_visits = self.max_node_visits  # Limite para evitar loops infinitos
+        deadline = self._deadline
+        stats = self.stats
+        clock = time.perf_counter
+        depth = 0  # Nível de decisão de curr
         start_time = time.time()
 
         while True:
             node_visits += 1
+            self.node_visits = node_visits
             if node_visits > max_node_visits:
-                print(f"Limite de {max_node_visits} visitas atingido.")
+                self.status = 'limit'
+                self._log(f"Limite de {max_node_visits} visitas atingido.")
+                return None
+            if deadline is not None and node_visits % self.TIME_CHECK_INTERVAL == 0 and time.time() > deadline:
+                self.status = 'limit'
+                self._log(f"Limite de tempo de {self.time_limit}s atingido.")
                 return None
 
             # Feedback de progresso
             if node_visits % 50000 == 0:
                 elapsed = time.time() - start_time
-                print(f"Visitas: {node_visits}... (Tempo: {elapsed:.2f}s)")
+                self._log(f"Visitas: {node_visits}... (Tempo: {elapsed:.2f}s)")
 
             # 1. Verifica se o estado atual é uma solução completa
             if curr.is_complete():
                 elapsed = time.time() - start_time
-                print(f"\nSolução encontrada! Visitas: {node_visits} (Tempo: {elapsed:.2f}s)")
+                self.status = 'solved'
+                stats.solutions += 1
+                self._log(f"\nSolução encontrada! Visitas: {node_visits} (Tempo: {elapsed:.2f}s)")
                 return curr.puzzle  # Retorna a solução
 
             # 2. Escolhe a próxima variável (célula) e ordena seus valores
             if curr.target is None:  # Só escolhe se ainda não foi escolhido para este nó
+                t0 = clock()
                 curr.choose_next_variable()
+                t1 = clock()
                 curr.get_ordered_values()
+                stats.time_value_ordering += clock() - t1
+                stats.time_variable_selection += t1 - t0
 
             # 3. Verifica se há um caminho a seguir (variável escolhida e valores restantes)
             if curr.target != (-1, -1) and curr.target_vals and curr.target_index < len(curr.target_vals):
@@ -307,25 +1591,34 @@ class BackTracker():
                 target_r, target_c = curr.target
 
                 # Cria um *novo* estado filho (Board) fazendo cópias profundas
-                new_puzzle = copy.deepcopy(curr.puzzle)
-                new_domains = copy.deepcopy(curr.domains)
-
-                # Atribui o valor no novo estado
-                new_puzzle[target_r][target_c] = val_to_try
-                new_domains[target_r][target_c] = {val_to_try}  # Fixa o domínio
-
-                # Cria o nó filho
-                child = self.Board(new_puzzle, self.root.h_const, self.root.v_const, curr)
-                child.domains = new_domains  # Atribui os domínios copiados e modificados
+                child = self.Board(copy.deepcopy(curr.puzzle), self.root.h_const, self.root.v_const, curr,
+                                   topology=self.root.topology, propagation=self.propagation,
+                                   hidden_singles=self.hidden_singles, alldiff=self.alldiff,
+                                   value_order=curr.value_order)
+                child.matchings = curr.matchings
+                child.weights = curr.weights
+                child.masks = list(curr.masks)  # Domínios são ints: cópia rasa basta
+                child.buckets = list(curr.buckets)
+                child.open_count = list(curr.open_count)
+                if curr.places is not None:
+                    child.places = list(curr.places)
                 child.target = None  # Filho precisará escolher sua própria variável
 
-                # Propaga as restrições a partir da nova atribuição no filho
-                if child._propagate_constraints(target_r, target_c, val_to_try):
+                # Atribui o valor no filho e propaga as restrições a partir dele
+                stats.decisions += 1
+                t0 = clock()
+                consistent = child.assign(target_r, target_c, val_to_try)
+                stats.time_propagation += clock() - t0
+                if consistent:
                     # ...avança para o estado filho
                     curr = child
+                    depth += 1
+                    if depth > stats.max_depth:
+                        stats.max_depth = depth
                 else:
                     # ...se a propagação falhou (inconsistência),
                     # descarta este valor e tenta o próximo no nó atual.
+                    stats.failures += 1
                     curr.target_index += 1
 
             else:
@@ -333,78 +1626,107 @@ class BackTracker():
                 if curr.parent is None:
                     # Chegou de volta à raiz e não há mais opções -> Sem solução
                     elapsed = time.time() - start_time
-                    print(f"\nBacktrack até a raiz sem solução. Visitas: {node_visits} (Tempo: {elapsed:.2f}s)")
+                    self._log(f"\nBacktrack até a raiz sem solução. Visitas: {node_visits} (Tempo: {elapsed:.2f}s)")
                     return None
 
                 # Sobe para o pai
                 curr = curr.parent
+                depth -= 1
+                stats.backtracks += 1
                 # Prepara para tentar o próximo valor do pai na próxima iteração
                 curr.target_index += 1
 
 # --- Fim da classe BackTracker ---
 
-def parse_input_file(filename):
+def parse_puzzle_lines(lines):
     """
-    Processa o arquivo de entrada no novo formato e retorna o puzzle e restrições
-    Lida com o formato que usa 'x' para representar ausência de comparação.
+    Interpreta as linhas (não vazias) de um puzzle no formato de grade de puzzle.txt:
+    linhas pares trazem os valores da linha do tabuleiro intercalados com as restrições
+    horizontais ('<', '>' ou 'x'); linhas ímpares trazem as restrições verticais entre
+    duas linhas do tabuleiro ('^', 'v' ou 'x') intercaladas com 'x'.
+        0 < 0 x 0 > 0
+        ^ x ^ x v x v
+        ...
+    O tamanho do tabuleiro é deduzido da primeira linha. Valores não numéricos ('0', '_')
+    representam células vazias. Retorna (puzzle, h_const, v_const); ValueError se inválido.
     """
-    try:
-        with open(filename, 'r') as f:
-            lines = [line.strip() for line in f if line.strip()]
-        
-        # Validação básica do número de linhas
-        if len(lines) < SIZE * 3 - 1:  # Puzzle + H_const + V_const (última linha V pode ser omitida)
-            raise ValueError(f"Formato de arquivo inválido. Esperadas pelo menos {SIZE*3-1} linhas não vazias.")
-        
-        # Extrai as linhas do puzzle, restrições horizontais e verticais
-        puzzle_lines = lines[0:SIZE*2-1:2]  # Linhas 0, 2, 4, 6 (puzzle)
-        horiz_lines = lines[1:SIZE*2-1:2]   # Linhas 1, 3, 5, 7 (restrições horizontais)
-        vert_lines = lines[SIZE*2-1:]       # Restante das linhas (restrições verticais)
-        
-        # Parse do puzzle
-        puzzle = []
-        for line in puzzle_lines:
-            row = []
-            items = line.split()
-            for item in items:
-                if item.isdigit():
-                    row.append(int(item))
-                else:
-                    row.append(0)  # Valor 0 representa célula vazia
-            puzzle.append(row)
-        
-        # Parse das restrições horizontais
-        h_const = {}
-        for r, line in enumerate(horiz_lines):
-            items = line.split()
-            for c, item in enumerate(items[1::2]):  # Pega apenas os símbolos de comparação
+    lines = [line.strip() for line in lines if line.strip()]
+    if not lines:
+        raise ValueError("Arquivo vazio.")
+    size = (len(lines[0].split()) + 1) // 2
+    if len(lines) != 2 * size - 1:
+        raise ValueError(f"Formato de arquivo inválido. Esperadas {2 * size - 1} linhas não vazias "
+                         f"para um tabuleiro {size}x{size}, encontradas {len(lines)}.")
+
+    puzzle = []
+    h_const = {}
+    v_const = {}
+    for i, line in enumerate(lines):
+        items = line.split()
+        if len(items) != 2 * size - 1:
+            raise ValueError(f"Linha {i + 1} deveria ter {2 * size - 1} itens: '{line}'")
+        r = i // 2
+        if i % 2 == 0:
+            # Linha do tabuleiro: valores nas posições pares, símbolos horizontais nas ímpares
+            puzzle.append([int(item) if item.isdigit() else 0 for item in items[0::2]])  # 0 = vazia
+            for c, item in enumerate(items[1::2]):
                 if item == '<':
                     h_const[(r, c)] = 0  # Célula da esquerda é menor
                 elif item == '>':
                     h_const[(r, c)] = 1  # Célula da esquerda é maior
                 # 'x' é ignorado, pois indica ausência de restrição
-        
-        # Parse das restrições verticais
-        v_const = {}
-        for r, line in enumerate(vert_lines):
-            items = line.split()
-            for c, item in enumerate(items):
+        else:
+            # Linha de restrições verticais entre as linhas r e r+1 do tabuleiro
+            for c, item in enumerate(items[0::2]):
                 if item == '^':
                     v_const[(r, c)] = 1  # Célula de cima é maior (aponta para cima)
                 elif item == 'v':
                     v_const[(r, c)] = 0  # Célula de cima é menor (aponta para baixo)
                 # 'x' é ignorado, pois indica ausência de restrição
-        
-        return puzzle, h_const, v_const
-    
+
+    if any(v > size for row in puzzle for v in row):
+        raise ValueError(f"Valores devem estar entre 1 e {size}.")
+    return puzzle, h_const, v_const
+
+def format_puzzle_lines(puzzle, h_const, v_const):
+    """Inverso de parse_puzzle_lines: linhas do puzzle no formato de grade de puzzle.txt"""
+    size = len(puzzle)
+    lines = []
+    for r in range(size):
+        items = []
+        for c in range(size):
+            items.append(str(puzzle[r][c]))
+            if c < size - 1:
+                rel = h_const.get((r, c))
+                items.append('x' if rel is None else '>' if rel == 1 else '<')
+        lines.append(" ".join(items))
+        if r < size - 1:
+            symbols = []
+            for c in range(size):
+                rel = v_const.get((r, c))
+                symbols.append('x' if rel is None else '^' if rel == 1 else 'v')
+            lines.append(" x ".join(symbols))
+    return lines
+
+def parse_input_file(filename):
+    """
+    Processa o arquivo de entrada (formato de grade, ver parse_puzzle_lines)
+    e retorna o puzzle e restrições. Encerra o programa se o arquivo for inválido.
+    """
+    try:
+        with open(filename, 'r') as f:
+            return parse_puzzle_lines(f)
     except Exception as e:
         print(f"Erro ao processar o arquivo de entrada '{filename}': {e}")
         sys.exit(1)
 
 def main():
-    parser = argparse.ArgumentParser(description=f'Resolvedor de Futoshiki {SIZE}x{SIZE} com Quadrantes')
+    parser = argparse.ArgumentParser(description='Resolvedor de Futoshiki com Quadrantes')
     parser.add_argument('--infile', type=str, required=True, help='Arquivo de entrada do puzzle')
     parser.add_argument('--outfile', type=argparse.FileType('w'), default=sys.stdout, help='Arquivo de saída da solução (padrão: stdout)')
+    parser.add_argument('--all', action='store_true', help='Escreve todas as soluções, à medida que são encontradas')
+    parser.add_argument('--max-solutions', type=int, default=None, help='Com --all, para após este número de soluções')
+    parser.add_argument('--stats', action='store_true', help='Escreve as estatísticas da busca (JSON) ao final')
     args = parser.parse_args()
 
     # Lê e processa o arquivo de entrada
@@ -420,6 +1742,20 @@ def main():
     print("\n----------------------")
     print("Resolvendo...")
 
+    if args.all:
+        # Cada solução é escrita assim que encontrada (nada fica em memória)
+        solver = BackTracker(puzzle_list, h_const, v_const, verbose=False)
+        count = 0
+        for solution_list in solver.iter_solutions(max_solutions=args.max_solutions):
+            printlst(solution_list, args.outfile)
+            count += 1
+        print(f"\nSoluções: {count} | Visitas: {solver.node_visits} | Status: {solver.status}")
+        if args.stats:
+            print(solver.stats.to_json())
+        if args.outfile != sys.stdout:
+            args.outfile.close()
+        return
+
     # Resolução
     solver = BackTracker(puzzle_list, h_const, v_const)
     solution_list = solver.solve()
@@ -436,6 +1772,9 @@ def main():
         if args.outfile != sys.stdout:
             args.outfile.write("Sem solucao\n")
             args.outfile.close()
+    if args.stats:
+        print("\n--- Estatísticas ---")
+        print(solver.stats.to_json())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,7 +3,7 @@ import numpy as np
 import argparse
 import sys
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
 
 SIZE = 4  # Define o tamanho do tabuleiro
 
@@ -31,7 +31,7 @@ def printlst(lst, f):
 
 class BackTracker():
     class Board():
-        def __init__(self, puzzle_arr, dom_arr, h_const, v_const, parent=None):
+        def __init__(self, puzzle_arr, dom_arr, h_const, v_const, parent=None, affected_cells=None):
             self.size = SIZE
             self.puzzle = puzzle_arr
             self.domains = dom_arr
@@ -43,9 +43,12 @@ class BackTracker():
             self.target_vals = []
             self.target_index = 0
             
-            # Cache para otimização
-            self._affected_cells = defaultdict(set)
-            self._initialize_affected_cells()
+            # Cache para otimização (compartilhado entre pai e filhos, calculado só na raiz)
+            if affected_cells is None:
+                affected_cells = defaultdict(set)
+                self._affected_cells = affected_cells
+                self._initialize_affected_cells()
+            self._affected_cells = affected_cells
 
         def _initialize_affected_cells(self):
             """Pre-computa células afetadas por cada posição para otimização"""
@@ -132,12 +135,13 @@ class BackTracker():
 
         def update(self):
             """Aplica consistência de arco otimizada"""
-            # Mantém uma fila de células para revisar
-            queue = [(r,c) for r in range(self.size) for c in range(self.size) 
-                    if self.puzzle[r][c] != 0]
+            # Mantém uma fila (deque, pop O(1)) de células para revisar.
+            # Cada célula entra uma única vez: só é enfileirada quando passa a ter valor.
+            queue = deque((r,c) for r in range(self.size) for c in range(self.size)
+                          if self.puzzle[r][c] != 0)
             
             while queue:
-                r, c = queue.pop(0)
+                r, c = queue.popleft()
                 value = self.puzzle[r][c]
                 
                 if not self._propagate_constraints(r, c, value):
@@ -258,7 +262,8 @@ class BackTracker():
                 new_puzzle[target_r][target_c] = val_to_try
                 new_domains[target_r][target_c] = {val_to_try}
 
-                child = self.Board(new_puzzle, new_domains, curr.h_const, curr.v_const, curr)
+                child = self.Board(new_puzzle, new_domains, curr.h_const, curr.v_const, curr,
+                                   affected_cells=curr._affected_cells)
                 
                 if child.update():
                     curr.children.append(child)
@@ -0,0 +1,302 @@
+"""
+Testes dos motores de busca e das simetrias do cache contra a enumeração exaustiva em
+puzzles pequenos fixos. Executar dentro de python_v: python -m unittest test_futoshiki
+"""
+import unittest
+from functools import lru_cache
+
+from futoshiki_cache import SolutionCache, canonical_form, from_canonical, get_transforms, to_canonical
+from futoshiki_dlx import DLXSolver
+from futoshiki_sat import SATSolver
+from futoshiki_solver import BackTracker, default_quad_size, parse_puzzle_lines
+
+# Puzzles no formato de puzzle.txt: único, com várias soluções e insatisfazível (4x4 com
+# quadrantes 2x2 e 5x5 sem quadrantes)
+PUZZLES = {
+    '4x4-unico': """
+        1 x 0 x 0 > 0
+        x x x x x x x
+        0 < 3 x 0 > 0
+        x x x x x x x
+        0 > 0 < 0 < 0
+        x x x x x x ^
+        0 x 0 x 0 x 0
+    """,
+    '4x4-varias': """
+        0 x 0 x 0 x 0
+        x x ^ x x x x
+        0 x 0 x 0 < 0
+        x x x x x x x
+        0 x 2 x 0 x 0
+        x x x x x x v
+        0 > 0 x 0 x 0
+    """,
+    '4x4-insatisfazivel': """
+        0 x 0 x 0 x 0
+        x x x x x x x
+        1 > 0 x 0 x 0
+        x x x x x x x
+        0 x 0 x 0 x 0
+        x x x x x x x
+        0 x 0 x 0 x 0
+    """,
+    '5x5-unico': """
+        0 > 0 x 3 > 0 x 0
+        ^ x v x x x x x x
+        0 x 0 x 0 x 0 > 3
+        x x x x x x x x x
+        0 x 0 < 0 < 0 x 0
+        x x ^ x v x x x v
+        0 > 0 x 0 x 0 x 0
+        x x x x x x x x x
+        3 x 0 x 0 < 0 x 0
+    """,
+    '5x5-varias': """
+        0 > 0 x 3 > 0 x 0
+        ^ x x x x x x x x
+        0 x 0 x 0 x 0 x 0
+        x x x x x x x x x
+        0 x 0 < 0 x 0 x 0
+        x x ^ x x x x x v
+        0 x 0 x 0 x 0 x 0
+        x x x x x x x x x
+        0 x 0 x 0 < 0 x 2
+    """,
+    # Sem o modelo dual, a busca com backjumping volta vários níveis e poda com nogoods
+    '5x5-backjump': """
+        0 x 0 x 0 > 0 < 0
+        x x ^ x x x x x v
+        0 < 0 x 0 x 0 x 0
+        x x x x x x x x x
+        0 x 0 x 0 x 0 x 0
+        x x v x x x v x x
+        0 x 0 > 0 < 0 x 0
+        ^ x ^ x x x x x x
+        0 x 0 x 0 x 0 x 0
+    """,
+}
+
+def load(name):
+    """(puzzle, h_const, v_const) de PUZZLES"""
+    return parse_puzzle_lines(PUZZLES[name].strip().splitlines())
+
+def brute_force_solutions(puzzle, h_const, v_const, quad_size=None):
+    """
+    Todas as soluções por enumeração direta, célula a célula em ordem de leitura, sem
+    propagação: cada valor só é verificado contra as células já preenchidas.
+    """
+    size = len(puzzle)
+    if quad_size is None:
+        quad_size = default_quad_size(size)
+    grid = [[0] * size for _ in range(size)]
+    solutions = []
+
+    def fits(r, c, v):
+        if any(grid[r][j] == v for j in range(c)) or any(grid[i][c] == v for i in range(r)):
+            return False
+        if quad_size:
+            r0, c0 = r - r % quad_size, c - c % quad_size
+            if any(grid[i][j] == v for i in range(r0, r + 1) for j in range(c0, c0 + quad_size)
+                   if (i, j) < (r, c)):
+                return False
+        rel = h_const.get((r, c - 1))
+        if rel is not None and (grid[r][c - 1] > v) != (rel == 1):
+            return False
+        rel = v_const.get((r - 1, c))
+        if rel is not None and (grid[r - 1][c] > v) != (rel == 1):
+            return False
+        return True
+
+    def fill(idx):
+        if idx == size * size:
+            solutions.append([row[:] for row in grid])
+            return
+        r, c = divmod(idx, size)
+        for v in ([puzzle[r][c]] if puzzle[r][c] else range(1, size + 1)):
+            if fits(r, c, v):
+                grid[r][c] = v
+                fill(idx + 1)
+        grid[r][c] = 0
+
+    fill(0)
+    return solutions
+
+@lru_cache(maxsize=None)
+def expected_solutions(name):
+    """brute_force_solutions de PUZZLES[name], calculada uma vez para todos os motores"""
+    return brute_force_solutions(*load(name))
+
+def as_key(grids):
+    """Grades como conjunto comparável"""
+    return {tuple(map(tuple, grid)) for grid in grids}
+
+def transform_puzzle(puzzle, h_const, v_const, transform):
+    """
+    Aplica uma transformação de get_transforms ao puzzle (dicas e desigualdades), de forma
+    independente de futoshiki_cache: retorna (puzzle, h_const, v_const) transformados.
+    """
+    perm, invert = transform
+    size = len(puzzle)
+
+    def move(r, c):
+        return divmod(perm[r * size + c], size)
+
+    new_puzzle = [[0] * size for _ in range(size)]
+    for r in range(size):
+        for c in range(size):
+            v = puzzle[r][c]
+            new_r, new_c = move(r, c)
+            new_puzzle[new_r][new_c] = size + 1 - v if v and invert else v
+    pairs = ([((r, c), (r, c + 1), rel) for (r, c), rel in h_const.items()]
+             + [((r, c), (r + 1, c), rel) for (r, c), rel in v_const.items()])
+    new_h, new_v = {}, {}
+    for first, second, rel in pairs:
+        greater, smaller = (first, second) if rel == 1 else (second, first)
+        greater, smaller = move(*greater), move(*smaller)
+        if invert:
+            greater, smaller = smaller, greater
+        first, second = min(greater, smaller), max(greater, smaller)
+        (new_h if first[0] == second[0] else new_v)[first] = 1 if greater == first else 0
+    return new_puzzle, new_h, new_v
+
+class EngineCases():
+    """
+    Casos comuns a todos os motores: count_solutions, iter_solutions e solve contra
+    brute_force_solutions. As subclasses definem make_solver.
+    """
+    def make_solver(self, puzzle, h_const, v_const):
+        raise NotImplementedError
+
+    @classmethod
+    def setUpClass(cls):
+        cls.expected = {name: expected_solutions(name) for name in PUZZLES}
+
+    def test_fixtures(self):
+        counts = {name: len(solutions) for name, solutions in self.expected.items()}
+        self.assertEqual(counts['4x4-unico'], 1)
+        self.assertGreater(counts['4x4-varias'], 1)
+        self.assertEqual(counts['4x4-insatisfazivel'], 0)
+        self.assertEqual(counts['5x5-unico'], 1)
+        self.assertGreater(counts['5x5-varias'], 1)
+        self.assertGreater(counts['5x5-backjump'], 1)
+
+    def test_count_solutions(self):
+        for name, solutions in self.expected.items():
+            with self.subTest(puzzle=name):
+                result = self.make_solver(*load(name)).count_solutions(limit=None)
+                self.assertEqual(tuple(result), (len(solutions), True))
+
+    def test_count_solutions_limit(self):
+        for name, solutions in self.expected.items():
+            with self.subTest(puzzle=name):
+                result = self.make_solver(*load(name)).count_solutions(limit=2)
+                self.assertEqual(result.count, min(len(solutions), 2))
+                self.assertEqual(result.exact, len(solutions) < 2)
+
+    def test_iter_solutions(self):
+        for name, solutions in self.expected.items():
+            with self.subTest(puzzle=name):
+                found = list(self.make_solver(*load(name)).iter_solutions())
+                self.assertEqual(len(found), len(solutions))
+                self.assertEqual(as_key(found), as_key(solutions))
+
+    def test_solve(self):
+        for name, solutions in self.expected.items():
+            with self.subTest(puzzle=name):
+                solver = self.make_solver(*load(name))
+                solution = solver.solve()
+                if solutions:
+                    self.assertIn(tuple(map(tuple, solution)), as_key(solutions))
+                    self.assertEqual(solver.status, 'solved')
+                else:
+                    self.assertIsNone(solution)
+                    self.assertEqual(solver.status, 'unsat')
+
+class BackTrackerTest(EngineCases, unittest.TestCase):
+    def make_solver(self, puzzle, h_const, v_const):
+        return BackTracker(puzzle, h_const, v_const, verbose=False)
+
+class MatchingAllDiffTest(EngineCases, unittest.TestCase):
+    """Filtro de Régin (Board._filter_alldiff) no lugar dos arcos binários"""
+    def make_solver(self, puzzle, h_const, v_const):
+        return BackTracker(puzzle, h_const, v_const, verbose=False, alldiff='matching')
+
+class BackjumpTest(EngineCases, unittest.TestCase):
+    """Backjumping com nogoods (BackTracker._nogood_reason/_record_nogood)"""
+    def make_solver(self, puzzle, h_const, v_const):
+        return BackTracker(puzzle, h_const, v_const, verbose=False, backjump=True)
+
+class BackjumpNoDualTest(EngineCases, unittest.TestCase):
+    """Backjumping sem o modelo dual, em que os nogoods chegam a podar"""
+    def make_solver(self, puzzle, h_const, v_const):
+        return BackTracker(puzzle, h_const, v_const, verbose=False, backjump=True, hidden_singles=False)
+
+    def test_nogoods_prune(self):
+        # Garante que os casos acima passam pelos saltos e pelas podas por nogood
+        solver = self.make_solver(*load('5x5-backjump'))
+        solver.count_solutions(limit=None)
+        self.assertGreater(solver.backjumps, 0)
+        self.assertGreater(solver.stats.pruned['nogood'], 0)
+
+class DLXSolverTest(EngineCases, unittest.TestCase):
+    def make_solver(self, puzzle, h_const, v_const):
+        return DLXSolver(puzzle, h_const, v_const, verbose=False)
+
+class SATSolverTest(EngineCases, unittest.TestCase):
+    def make_solver(self, puzzle, h_const, v_const):
+        return SATSolver(puzzle, h_const, v_const, verbose=False)
+
+class CanonicalFormTest(unittest.TestCase):
+    """Simetrias de futoshiki_cache (get_transforms, canonical_form, to/from_canonical)"""
+    SMALL = ('4x4-unico', '4x4-varias', '4x4-insatisfazivel', '5x5-unico')  # Enumeráveis 16 vezes
+
+    def test_transforms_map_solutions(self):
+        # As soluções do puzzle transformado são exatamente as soluções transformadas
+        for name in self.SMALL:
+            puzzle, h_const, v_const = load(name)
+            transforms = get_transforms(len(puzzle), default_quad_size(len(puzzle)))
+            self.assertEqual(len(transforms), 16)
+            for i, transform in enumerate(transforms):
+                with self.subTest(puzzle=name, transform=i):
+                    moved = brute_force_solutions(*transform_puzzle(puzzle, h_const, v_const, transform))
+                    self.assertEqual(as_key(moved),
+                                     as_key(to_canonical(grid, transform) for grid in expected_solutions(name)))
+
+    def test_round_trip(self):
+        for name in PUZZLES:
+            puzzle, h_const, v_const = load(name)
+            for i, transform in enumerate(get_transforms(len(puzzle), default_quad_size(len(puzzle)))):
+                for grid in expected_solutions(name)[:5]:
+                    with self.subTest(puzzle=name, transform=i):
+                        self.assertEqual(from_canonical(to_canonical(grid, transform), transform), grid)
+
+    def test_canonical_form(self):
+        # Todas as simetrias têm a mesma forma canônica, que é o puzzle levado pela sua transformação
+        for name in PUZZLES:
+            puzzle, h_const, v_const = load(name)
+            key, transform = canonical_form(puzzle, h_const, v_const)
+            canonical = transform_puzzle(puzzle, h_const, v_const, transform)
+            self.assertEqual(key[2:], (tuple(v for row in canonical[0] for v in row),
+                                       tuple(sorted(canonical[1].items())), tuple(sorted(canonical[2].items()))))
+            for i, other in enumerate(get_transforms(len(puzzle), default_quad_size(len(puzzle)))):
+                with self.subTest(puzzle=name, transform=i):
+                    self.assertEqual(canonical_form(*transform_puzzle(puzzle, h_const, v_const, other))[0], key)
+
+    def test_solution_cache(self):
+        # Uma simetria do puzzle já resolvido sai do cache com a solução no seu próprio referencial
+        for name in self.SMALL:
+            puzzle, h_const, v_const = load(name)
+            cache = SolutionCache()
+            cache.solve(puzzle, h_const, v_const)
+            for i, transform in enumerate(get_transforms(len(puzzle), default_quad_size(len(puzzle)))):
+                with self.subTest(puzzle=name, transform=i):
+                    moved = transform_puzzle(puzzle, h_const, v_const, transform)
+                    solution, status, _ = cache.solve(*moved)
+                    if status == 'solved':
+                        self.assertIn(tuple(map(tuple, solution)), as_key(brute_force_solutions(*moved)))
+                    else:
+                        self.assertEqual((status, expected_solutions(name)), ('unsat', []))
+            self.assertEqual(cache.hits, 16)
+
+if __name__ == '__main__':
+    unittest.main()